@@ -5,8 +5,6 @@
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import sys
 import os
 
@@ -17,6 +15,7 @@ sys.path.insert(0, src_dir)
 
 from data_loader import DataLoader
 from ranking_engine import RankingEngine
+from pipeline_timing import begin_run
 
 # 頁面設定
 st.set_page_config(
@@ -64,6 +63,14 @@ def get_data_loader():
     return DataLoader()
 
 
+@st.cache_resource(max_entries=2)
+def get_ranking_engine(data_version, _df):
+    """計算排名並建立查詢索引（同一資料版本只計算一次，所有工作階段共用）"""
+    ranking_engine = RankingEngine(_df.copy())
+    ranking_engine.calculate_rankings()
+    return ranking_engine
+
+
 def display_header():
     """顯示頁首"""
     st.markdown('<div class="main-header">🏃‍♂️ 健康達人積分賽</div>', unsafe_allow_html=True)
@@ -191,7 +198,7 @@ def display_overview_tab(female_top, male_top):
             st.warning("暫無資料")
 
 
-def display_full_ranking_tab(df, gender_label, emoji):
+def display_full_ranking_tab(df, gender_label, emoji, max_prize_rank):
     """顯示完整排名頁"""
     st.subheader(f"{emoji} {gender_label}完整排行榜（共 {len(df)} 人）")
     
@@ -262,7 +269,6 @@ def display_full_ranking_tab(df, gender_label, emoji):
         with col3:
             st.metric("最高分", f"{filtered_df['total'].max():.0f} 分")
         with col4:
-            max_prize_rank = 28 if gender_label == '女性組' else 14
             prize_line_name = f"前{max_prize_rank}名分數線"
             
             if len(df) >= max_prize_rank:
@@ -271,8 +277,7 @@ def display_full_ranking_tab(df, gender_label, emoji):
             else:
                 st.metric(prize_line_name, "N/A")
         
-        prize_info = f"前 {max_prize_rank} 名" if gender_label == '女性組' else "前 14 名"
-        st.info(f"💡 {prize_info}可獲得獎金！繼續加油 💪")
+        st.info(f"💡 前 {max_prize_rank} 名可獲得獎金！繼續加油 💪")
     else:
         st.warning("沒有符合條件的資料")
 
@@ -281,18 +286,12 @@ def display_personal_query_tab(ranking_engine, activity_analyzer):
     """顯示個人查詢頁"""
     st.subheader("🔍 個人成績查詢")
     
-    # 取得所有姓名列表
-    all_names = pd.concat([
-        ranking_engine.female_df['姓名'],
-        ranking_engine.male_df['姓名']
-    ]).unique().tolist()
-    
     col1, col2 = st.columns([3, 1])
     
     with col1:
         selected_name = st.selectbox(
             "請選擇您的姓名",
-            ['請選擇...'] + sorted(all_names),
+            ['請選擇...'] + ranking_engine.sorted_names,
             key="name_select"
         )
     
@@ -324,33 +323,31 @@ def display_personal_query_tab(ranking_engine, activity_analyzer):
                 """)
             
             # 獎金資訊
-            max_prize_rank = 28 if group == '女性組' else 14
-            prize_line_name = "第28名" if group == '女性組' else "第14名"
+            max_prize_rank = ranking_engine.max_prize_rank(group)
+            prize_line_name = f"第{max_prize_rank}名"
             current_score = person_data['total']
             
             # 檢查是否符合獎金條件：排名和分數都要符合
             if person_data['排名'] <= max_prize_rank and current_score >= 200:
                 st.success(f"🎉 恭喜！您目前排名第 {person_data['排名']} 名，總分 {current_score} 分，可獲得獎金 **{person_data['獎金']}** {person_data['獎牌']}")
                 
-                # 計算與前一名的差距
-                group_df = ranking_engine.female_df if group == '女性組' else ranking_engine.male_df
+                # 與前一名及下一獎級的差距（排名時已計算）
                 if person_data['排名'] > 1:
-                    diff = ranking_engine.get_rank_difference(person_data, group_df)
+                    diff = person_data['距前一名']
                     st.info(f"💪 距離第 {person_data['排名']-1} 名還差 **{diff:.0f}** 分，加油！")
+                if person_data['距下一獎級'] > 0:
+                    st.info(f"🏆 再 **{person_data['距下一獎級']:.0f}** 分可晉升下一個獎級！")
             else:
                 # 分別提示排名和分數條件
                 if person_data['排名'] <= max_prize_rank and current_score < 200:
                     # 特殊情況：進入獎金排名但分數不足200分的提醒
-                    score_diff = 200 - current_score
+                    score_diff = person_data['距獎金門檻']
                     st.warning(f"🔔 特別提醒：雖然您的排名已進入獎金圈（第 {person_data['排名']} 名），但總分 {current_score} 分未達獎金門檻（需≥200分），還差 **{score_diff:.0f}** 分才能獲得獎金！💪")
                 elif person_data['排名'] > max_prize_rank:
-                    group_df = ranking_engine.female_df if group == '女性組' else ranking_engine.male_df
-                    if len(group_df) >= max_prize_rank:
-                        prize_line_score = group_df.iloc[max_prize_rank-1]['total']
-                        rank_diff = prize_line_score - current_score
-                        st.warning(f"排名未達獎金線（{prize_line_name}），還差 **{rank_diff:.0f}** 分，繼續努力！💪")
+                    rank_diff = person_data['距獎金線']
+                    st.warning(f"排名未達獎金線（{prize_line_name}），還差 **{rank_diff:.0f}** 分，繼續努力！💪")
                 elif current_score < 200:
-                    score_diff = 200 - current_score
+                    score_diff = person_data['距獎金門檻']
                     st.warning(f"總分未達獎金門檻（需大於等於200分），還差 **{score_diff:.0f}** 分，繼續努力！💪")
                 else:
                     st.warning(f"雖然總分已達標（{current_score}分），但排名尚未進入獎金圈，繼續加油！💪")
@@ -429,18 +426,9 @@ def display_personal_query_tab(ranking_engine, activity_analyzer):
                 # 社團活動詳細列表 - 新版表格和圖表
                 st.markdown("#### 🎯 參與社團活動列表")
                 
-                # 從新架構取得該參賽者的社團活動明細
+                # 從活動分析器（資料快照）取得該參賽者的社團活動明細
                 try:
-                    # 載入新架構的社團活動明細
-                    import sys
-                    import os
-                    sys.path.append('src')
-                    from new_data_loader import NewDataLoader
-                    
-                    new_loader = NewDataLoader()
-                    new_loader.processor.load_all_periods_data()
-                    new_loader.processor.build_participant_activity_stats()
-                    club_details = new_loader.processor.get_club_activity_details()
+                    club_details = activity_analyzer.club_details
                     
                     # 篩選該參賽者的社團活動
                     person_club_activities = club_details[club_details['姓名'] == selected_name]
@@ -545,6 +533,44 @@ def display_personal_query_tab(ranking_engine, activity_analyzer):
             
         else:
             st.error(f"找不到 {selected_name} 的資料")
+    
+    # 名次試算（不需按查詢，選擇姓名後即可使用）
+    if selected_name != '請選擇...':
+        display_what_if_simulator(ranking_engine, selected_name)
+
+
+def display_what_if_simulator(ranking_engine, selected_name):
+    """顯示名次試算：輸入增加的活動紀錄，試算名次與獎金"""
+    with st.expander("🔮 名次試算：如果再多做一些，名次會是多少？"):
+        points = ranking_engine.ACTIVITY_POINTS
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            exercise = st.number_input(f"🏃 日常運動（次，每次 {points['exercise']} 分）", min_value=0, step=1, key="sim_exercise")
+        with col2:
+            diet = st.number_input(f"🍎 健康飲食（次，每次 {points['diet']} 分）", min_value=0, step=1, key="sim_diet")
+        with col3:
+            bonus = st.number_input(f"⭐ 額外加分（次，每次 {points['bonus']} 分）", min_value=0, step=1, key="sim_bonus")
+        with col4:
+            club_points = st.number_input("🎯 社團活動（分）", min_value=0, step=10, key="sim_club")
+        
+        result = ranking_engine.simulate(selected_name, exercise, diet, bonus, club_points)
+        if result is None:
+            st.error(f"找不到 {selected_name} 的資料")
+            return
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("試算總分", f"{result['total']:.0f} 分")
+        with col2:
+            st.metric(
+                f"試算{result['group']}排名",
+                f"第 {result['rank']} 名",
+                delta=f"{result['rank_change']} 名" if result['rank_change'] else None
+            )
+        with col3:
+            st.metric("試算獎金", f"{result['prize']} {result['medal']}".strip())
+        
+        st.caption("試算以目前其他參賽者的分數為準；同分時排在已達到該分數的參賽者之後。")
 
 
 def display_activity_intro_tab():
@@ -701,6 +727,9 @@ def display_activity_intro_tab():
 
 def display_statistics_tab(df):
     """顯示統計圖表頁"""
+    # plotly 載入較慢，延遲到繪製圖表時才載入
+    import plotly.express as px
+
     st.subheader("📈 活動統計分析")
     
     # 活動次數與分數統計圓餅圖
@@ -755,7 +784,7 @@ def display_statistics_tab(df):
     # 部門參與度
     if '所屬部門' in df.columns:
         st.markdown("### 各部門參與度")
-        dept_gender = df.groupby(['所屬部門', '性別']).size().reset_index(name='人數')
+        dept_gender = df.groupby(['所屬部門', '性別'], observed=True).size().reset_index(name='人數')
         
         fig2 = px.bar(
             dept_gender,
@@ -775,7 +804,7 @@ def display_statistics_tab(df):
     score_labels = ['0-100', '101-200', '201-300', '301-400', '401-500', '500+']
     df['分數區間'] = pd.cut(df['total'], bins=score_bins, labels=score_labels)
     
-    score_dist = df.groupby(['分數區間', '性別']).size().reset_index(name='人數')
+    score_dist = df.groupby(['分數區間', '性別'], observed=True).size().reset_index(name='人數')
     
     fig3 = px.bar(
         score_dist,
@@ -788,14 +817,77 @@ def display_statistics_tab(df):
     st.plotly_chart(fig3, use_container_width=True)
 
 
+def display_timing_panel():
+    """顯示各處理階段的計時紀錄（網址加上 ?admin=1 時才顯示）"""
+    if st.query_params.get('admin') != '1':
+        return
+    
+    from pipeline_timing import MAX_RUNS, recent_runs_frame
+    
+    with st.expander(f"⏱️ 處理階段計時（最近 {MAX_RUNS} 次執行）"):
+        timings = recent_runs_frame()
+        if timings.empty:
+            st.info("尚無計時紀錄")
+            return
+        
+        # 各階段摘要
+        summary = timings.groupby('階段', sort=False)['耗時(ms)'].agg(['count', 'mean', 'max']).round(1)
+        summary.columns = ['執行次數', '平均耗時(ms)', '最長耗時(ms)']
+        st.dataframe(summary, use_container_width=True)
+        
+        # 每次執行的明細（新到舊）
+        st.dataframe(timings.round({'耗時(ms)': 1}), hide_index=True, use_container_width=True)
+
+
+def display_score_correction_panel(ranking_engine):
+    """套用單筆分數更正（網址加上 ?admin=1 時才顯示）
+
+    更正直接套用到所有工作階段共用的排名引擎，只重新計算受影響的名次區間；
+    工作簿更新（資料版本改變）後排名依新資料重新計算，更正不再保留。
+    """
+    if st.query_params.get('admin') != '1':
+        return
+    
+    with st.expander("✏️ 分數更正（套用至排名，資料更新後以工作簿為準）"):
+        categories = {'不指定': None, '日常運動': '日常運動總分', '健康飲食': '飲食總分',
+                      '額外加分': 'Bonus總分', '社團活動': '社團活動總分'}
+        with st.form("score_correction"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                name = st.selectbox("參賽者", options=ranking_engine.sorted_names)
+            with col2:
+                delta = st.number_input("分數增減", step=10, value=0)
+            with col3:
+                category = st.selectbox("分項", options=list(categories))
+            submitted = st.form_submit_button("套用更正")
+        
+        if submitted and delta:
+            result = ranking_engine.apply_score_update(name, delta, categories[category])
+            if result is None:
+                st.error(f"找不到 {name} 的資料")
+            else:
+                st.success(
+                    f"{name}（{result['group']}）總分 {result['total']:.0f} 分，"
+                    f"第 {result['old_rank']} 名 → 第 {result['new_rank']} 名"
+                )
+
+
 def main():
     """主程式"""
+    begin_run('dashboard')
+    
     # 顯示頁首
     display_header()
     
     # 載入資料
     loader = get_data_loader()
-    df = loader.load_data()
+    # 同一次執行只取一次快照，資料與排名快取鍵使用同一版資料
+    try:
+        snapshot = loader.get_snapshot()
+    except Exception as e:
+        st.error(f"❌ 載入資料時發生錯誤：{str(e)}")
+        return
+    df = loader.load_data(snapshot)
     
     if df is None:
         st.error("❌ 無法載入資料，請檢查檔案路徑")
@@ -813,10 +905,10 @@ def main():
     df = loader.clean_data(df)
     
     # 獲取統計資訊
-    stats = loader.get_statistics(df)
+    stats = loader.get_statistics(df, snapshot)
     
     # 獲取活動分析器和活動統計
-    activity_analyzer = loader.get_activity_analyzer()
+    activity_analyzer = loader.get_activity_analyzer(snapshot)
     activity_stats = activity_analyzer.get_overall_statistics()
     
     # 顯示關鍵指標
@@ -825,8 +917,9 @@ def main():
     st.markdown("---")
     
     # 計算排名
-    ranking_engine = RankingEngine(df)
-    female_df, male_df = ranking_engine.calculate_rankings()
+    ranking_engine = get_ranking_engine(snapshot.version, df)
+    display_score_correction_panel(ranking_engine)
+    female_df, male_df = ranking_engine.female_df, ranking_engine.male_df
     female_top, male_top = ranking_engine.get_top_n(10)
     
     # 選項卡
@@ -843,10 +936,10 @@ def main():
         display_overview_tab(female_top, male_top)
     
     with tab2:
-        display_full_ranking_tab(female_df, "女性組", "🌸")
+        display_full_ranking_tab(female_df, "女性組", "🌸", ranking_engine.max_prize_rank("女性組"))
     
     with tab3:
-        display_full_ranking_tab(male_df, "男性組", "💪")
+        display_full_ranking_tab(male_df, "男性組", "💪", ranking_engine.max_prize_rank("男性組"))
     
     with tab4:
         display_personal_query_tab(ranking_engine, activity_analyzer)
@@ -857,6 +950,8 @@ def main():
     with tab6:
         display_activity_intro_tab()
     
+    display_timing_panel()
+    
     # 頁尾
     st.markdown("---")
     st.markdown("""
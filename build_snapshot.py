@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+建立儀表板資料快照檔
+解析每周分數累積工作簿並寫入 data/dashboard_snapshot/（Parquet 資料表與 JSON 清單），儀表板啟動時直接載入，
+不需重新解析 Excel（工作簿內容變更後快照檔會自動視為過期）
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# 添加src路徑
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from snapshot import build_snapshot, save_snapshot, snapshot_artifact_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='建立儀表板資料快照檔')
+    parser.add_argument('--excel', default=os.path.join('data', '每周分數累積.xlsx'),
+                        help='每周分數累積工作簿路徑')
+    parser.add_argument('--output', default=None,
+                        help='快照輸出目錄（預設為工作簿目錄下的 dashboard_snapshot）')
+    parser.add_argument('--streaming', action=argparse.BooleanOptionalAction, default=None,
+                        help='以串流模式逐批讀取期間工作表（預設依工作簿大小自動選擇）')
+    args = parser.parse_args(argv)
+
+    excel_path = os.path.abspath(args.excel)
+    if not os.path.exists(excel_path):
+        print(f"❌ 找不到工作簿：{excel_path}")
+        return 1
+
+    start = time.perf_counter()
+    snapshot = build_snapshot(excel_path, streaming=args.streaming)
+    if snapshot is None:
+        print("❌ 無法建立資料快照")
+        return 1
+
+    output_path = save_snapshot(snapshot, args.output or snapshot_artifact_path(excel_path))
+    elapsed = time.perf_counter() - start
+    size_kb = sum(entry.stat().st_size for entry in os.scandir(output_path)) / 1024
+
+    print(f"✅ 資料快照檔已產生: {output_path}")
+    print(f"   - 參賽者: {len(snapshot.dashboard_table)} 位")
+    print(f"   - 社團活動明細: {len(snapshot.club_details)} 筆記錄")
+    print(f"   - 檔案大小: {size_kb:.1f} KB，耗時 {elapsed:.2f} 秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+檢查儀表板入口的啟動匯入時間
+以 python -X importtime 量測 app.py 與 src/dashboard.py 模組層級匯入的耗時，
+超過預算、專案模組在模組層級匯入應延遲載入的套件（plotly、pytz），
+或啟動時已載入 plotly.express 時回傳非零結束碼
+
+用法：
+    python scripts/check_import_time.py
+    python scripts/check_import_time.py --budget-ms 1500
+"""
+
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 入口檔案 → 啟動匯入時間預算（毫秒）
+ENTRY_POINTS = {
+    'app.py': 2000,
+    os.path.join('src', 'dashboard.py'): 2000,
+}
+
+# 專案模組不應在模組層級匯入的套件（streamlit 與 pandas 可能自行載入其中一部分）
+DEFERRED_PACKAGES = ('plotly', 'pytz')
+
+# 啟動時不應出現的較重模組（不論由誰載入）
+DEFERRED_MODULES = ('plotly.express',)
+
+
+def top_level_imports(entry_path):
+    """取得入口檔案模組層級的 import（不含函式內延遲載入的部分）"""
+    with open(entry_path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=entry_path)
+
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def project_imports(modules, seen=None):
+    """遞迴取得 src 下專案模組在模組層級匯入的所有模組"""
+    seen = set() if seen is None else seen
+    found = []
+    for module in modules:
+        found.append(module)
+        path = os.path.join(PROJECT_ROOT, 'src', module.split('.')[0] + '.py')
+        if module in seen or not os.path.exists(path):
+            continue
+        seen.add(module)
+        found.extend(project_imports(top_level_imports(path), seen))
+    return found
+
+
+def measure_imports(modules):
+    """以 -X importtime 在新的程序中匯入模組
+
+    Returns:
+        list: (模組名稱, 巢狀層級, 自身耗時微秒, 累計耗時微秒)
+    """
+    code = "; ".join(
+        ["import sys", f"sys.path.insert(0, {os.path.join(PROJECT_ROOT, 'src')!r})"]
+        + [f"import {module}" for module in modules]
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, encoding='utf-8',
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else '匯入失敗')
+
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        records.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return records
+
+
+def check_entry_point(entry, budget_ms):
+    """量測單一入口並輸出報告，回傳是否通過"""
+    modules = top_level_imports(os.path.join(PROJECT_ROOT, entry))
+    records = measure_imports(modules)
+
+    top_level = [record for record in records if record[1] == 0]
+    total_ms = sum(record[3] for record in top_level) / 1000
+    deferred = sorted(
+        {name for name in project_imports(modules) if name.split('.')[0] in DEFERRED_PACKAGES}
+        | {name for name, _, _, _ in records if name in DEFERRED_MODULES}
+    )
+
+    passed = total_ms <= budget_ms and not deferred
+    status = '✅' if passed else '❌'
+    print(f"{status} {entry}：啟動匯入 {total_ms:.0f} ms（預算 {budget_ms} ms）")
+    for name, _, _, cumulative_us in sorted(top_level, key=lambda r: r[3], reverse=True)[:5]:
+        print(f"   - {name}: {cumulative_us / 1000:.0f} ms")
+    if deferred:
+        print(f"   ❌ 啟動時載入了應延遲載入的套件：{', '.join(deferred)}")
+    return passed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='檢查儀表板入口的啟動匯入時間')
+    parser.add_argument('--budget-ms', type=int, default=None,
+                        help='覆寫所有入口的匯入時間預算（毫秒）')
+    args = parser.parse_args(argv)
+
+    passed = True
+    for entry, budget_ms in ENTRY_POINTS.items():
+        if args.budget_ms is not None:
+            budget_ms = args.budget_ms
+        passed = check_entry_point(entry, budget_ms) and passed
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,16 +5,21 @@ echo   健康達人積分賽 - 資料更新工具
 echo ================================================
 echo.
 
-echo [1/3] 檢查 Git 狀態...
+echo [1/4] 檢查 Git 狀態...
 git status
 echo.
 
-echo [2/3] 新增並提交變更...
+echo [2/4] 建立資料快照檔...
+python build_snapshot.py
+echo.
+
+echo [3/4] 新增並提交變更...
 git add data/20250903分數累積表.xlsx
+git add data/dashboard_snapshot
 git commit -m "更新分數資料 - %date% %time%"
 echo.
 
-echo [3/3] 上傳到 GitHub...
+echo [4/4] 上傳到 GitHub...
 git push origin main
 echo.
 
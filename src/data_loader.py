@@ -5,10 +5,97 @@
 
 import pandas as pd
 import streamlit as st
-from datetime import datetime
-import pytz
+from datetime import datetime, timedelta, timezone
 import os
 
+from pipeline_timing import logger, mark_cache_hit, timed_stage
+
+
+# 台灣時區（UTC+8，無日光節約時間），不需為此載入 pytz
+TAIPEI_TZ = timezone(timedelta(hours=8), 'Asia/Taipei')
+
+# 活動統計分析報告摘要（路徑 → 摘要，含內容雜湊），報告未變更時不重複讀取
+_report_summary_cache = {}
+
+
+def load_report_summary(report_path, snapshot=None):
+    """取得活動統計分析報告的參賽者總數與名單
+
+    資料快照中的摘要與報告的檔名及內容雜湊相同時直接使用，
+    否則讀取報告（依內容雜湊快取）。
+
+    Returns:
+        dict: participant_count（可能為 None）與 names（frozenset）；報告不存在時回傳 None
+    """
+    from snapshot import read_report_summary, report_fingerprint
+
+    fingerprint = report_fingerprint(report_path)
+    if fingerprint is None:
+        _report_summary_cache.pop(report_path, None)
+        return None
+
+    precomputed = getattr(snapshot, 'report_summary', None)
+    if precomputed is not None and (precomputed['filename'], precomputed['sha256']) == fingerprint:
+        return precomputed
+
+    cached = _report_summary_cache.get(report_path)
+    if cached is not None and (cached['filename'], cached['sha256']) == fingerprint:
+        return cached
+
+    summary = read_report_summary(report_path)
+    _report_summary_cache[report_path] = summary
+    return summary
+
+
+# 參加者活動統計表欄位 → 儀表板欄位（期間k分數另外對應為 total_期間k）
+DASHBOARD_COLUMN_MAP = {
+    '姓名': '姓名',
+    '性別': '性別',
+    '所屬部門': '所屬部門',
+    'total': 'total',
+    '運動總得分': '日常運動總分',
+    '飲食總得分': '飲食總分',
+    'Bonus總得分': 'Bonus總分',
+    '社團總得分': '社團活動總分',
+    '運動總次數': '日常運動總次數',
+    '飲食總次數': '飲食總次數',
+    'Bonus總次數': 'Bonus總次數',
+    '社團總次數': '社團活動總次數',
+}
+
+# 舊版逐期統計欄位：儀表板欄位 → 社團活動明細統計欄位
+LEGACY_SCORE_COLUMNS = {
+    '日常運動總分': '日常運動得分',
+    '飲食總分': '飲食得分',
+    'Bonus總分': '個人Bonus得分',
+    '社團活動總分': '參加社團得分',
+    '日常運動總次數': '日常運動次數',
+    '飲食總次數': '飲食次數',
+    'Bonus總次數': '個人Bonus次數',
+    '社團活動總次數': '參加社團次數',
+}
+
+
+def dashboard_column_map(participant_stats):
+    """取得參加者活動統計表轉換為儀表板格式的欄位對應"""
+    from new_data_processor import period_score_columns
+
+    column_map = dict(DASHBOARD_COLUMN_MAP)
+    # 期間分解（期間k分數 → total_期間k）
+    for col in period_score_columns(participant_stats):
+        column_map[col] = f"total_{col[:-2]}"
+    return column_map
+
+
+def to_dashboard_frame(participant_stats):
+    """以欄位對應將參加者活動統計表轉換為儀表板格式（選取欄位後一次改名）"""
+    column_map = dashboard_column_map(participant_stats)
+    df = participant_stats[list(column_map)].rename(columns=column_map).reset_index(drop=True)
+    # 只填補數值欄位的缺失值（類別欄位無法填入不在類別中的值）
+    numeric_cols = df.select_dtypes('number').columns
+    df[numeric_cols] = df[numeric_cols].fillna(0)
+    return df
+
 
 class DataLoader:
     """資料載入器"""
@@ -17,6 +104,7 @@ class DataLoader:
         # 取得專案根目錄（src 的上一層）
         current_dir = os.path.dirname(os.path.abspath(__file__))
         project_root = os.path.dirname(current_dir)
+        self.project_root = project_root
         
         # 使用新的EXCEL檔案
         if file_paths is None:
@@ -34,53 +122,66 @@ class DataLoader:
         self.activity_analyzer = None  # 延遲初始化
         self.new_loader = None  # 新資料載入器實例
         self.correct_loader = None  # 修正後的資料載入器實例
+        self.snapshot_refresher = None  # 背景更新資料快照（延遲初始化）
         
-    @st.cache_data(ttl=300)  # 5分鐘快取
-    def load_data(_self):
-        """載入新的EXCEL檔案結構資料"""
+    def get_data_version(self):
+        """取得目前的資料版本（檔案內容變更時才會改變）"""
+        from snapshot import data_version
+        return data_version(self.file_paths[0])
+
+    def get_snapshot(self):
+        """取得目前的資料快照
+
+        資料變更時由背景執行緒建立新快照並替換，替換完成前持續回傳前一版快照，
+        請求不需等待資料處理（只有第一次啟動時會同步建立）。
+        """
+        if self.snapshot_refresher is None:
+            from snapshot import SnapshotRefresher
+            self.snapshot_refresher = SnapshotRefresher(self.file_paths[0])
+        return self.snapshot_refresher.get()
+
+    @timed_stage('載入資料')
+    def load_data(self, snapshot=None):
+        """載入新的EXCEL檔案結構資料（依資料快照版本快取，資料變更時才重新載入）
+
+        Args:
+            snapshot: 要使用的資料快照（省略時取目前的快照）；需要以資料版本快取後續結果時，
+                請先以 get_snapshot() 取得快照並傳入，避免背景更新在兩次取得之間替換快照
+        """
+        try:
+            if snapshot is None:
+                snapshot = self.get_snapshot()
+        except Exception as e:
+            st.error(f"❌ 載入資料時發生錯誤：{str(e)}")
+            import traceback
+            traceback.print_exc()
+            return None
+
+        if snapshot is None:
+            st.error("❌ 無法載入參加者活動統計表")
+            return None
+        mark_cache_hit(True)  # 未命中快取時由 _load_data 改為 False
+        return self._load_data(snapshot.version, snapshot)
+
+    @st.cache_data(max_entries=2)
+    def _load_data(_self, data_version, _snapshot):
+        """載入指定資料版本的儀表板資料"""
+        mark_cache_hit(False)
         try:
-            # 直接載入參加者活動統計表
-            import os
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            project_root = os.path.dirname(current_dir)
-            stats_path = os.path.join(project_root, 'data', '參加者活動統計表.xlsx')
-
-            # 檢查檔案是否存在，不存在則先生成
-            if not os.path.exists(stats_path):
-                print("參加者活動統計表不存在，正在生成...")
-                from new_data_processor import NewDataProcessor
-                processor = NewDataProcessor(_self.file_paths[0])
-                processor.process_all()
-
-            # 載入參加者活動統計表
-            participant_stats = pd.read_excel(stats_path)
-
-            if participant_stats is None or participant_stats.empty:
+            # 從資料快照取得參加者活動統計表
+            snapshot = _snapshot
+
+            if snapshot.dashboard_table.empty:
                 st.error("❌ 無法載入參加者活動統計表")
                 return None
 
             # 轉換為適合儀表板的格式
-            merged_df = _self._convert_to_dashboard_format_new(participant_stats)
+            merged_df = _self._convert_to_dashboard_format_new(snapshot.dashboard_table)
 
             if merged_df is None:
                 st.error("❌ 資料格式轉換失敗")
                 return None
 
-            print(f"載入完成：{len(merged_df)} 位參賽者")
-
-            # 儲存processor以供活動分析使用
-            from new_data_processor import NewDataProcessor
-            _self.new_processor = NewDataProcessor(_self.file_paths[0])
-            _self.new_processor.load_account_info()
-            _self.new_processor.load_period_data('0808-0830')
-            _self.new_processor.load_period_data('0831-0921')
-            # 重建社團活動明細
-            all_club_details = []
-            for sheet_name, df in _self.new_processor.period_data.items():
-                club_df = _self.new_processor.transform_club_activities(df, sheet_name)
-                all_club_details.append(club_df)
-            _self.new_processor.club_details = pd.concat(all_club_details, ignore_index=True)
-
             return merged_df
 
         except Exception as e:
@@ -95,86 +196,56 @@ class DataLoader:
             # 取得帳號資訊
             account_info = self.new_loader.account_info
             if account_info is None:
-                print("警告：無法取得帳號資訊")
+                logger.warning("無法取得帳號資訊")
                 return None
             
             # 按姓名聚合統計資料
-            dashboard_data = []
-            
-            # 按姓名分組
             grouped = participant_stats.groupby('姓名')
+            totals = grouped[list(LEGACY_SCORE_COLUMNS.values())].sum()
+            participant_ids = grouped['id'].first()
             
-            for name, group in grouped:
-                # 取得該參與者的帳號資訊
-                participant_id = group['id'].iloc[0]
-                
-                # 從帳號整理取得基本資訊
-                gender = ''
-                department = ''
-                if participant_id in account_info.index:
-                    gender = account_info.loc[participant_id, '性別'] if '性別' in account_info.columns else ''
-                    # 尋找部門欄位
-                    dept_columns = ['所屬部門', '部門', 'department']
-                    for col in dept_columns:
-                        if col in account_info.columns:
-                            department = account_info.loc[participant_id, col]
-                            break
-                
-                # 計算總分
-                total_exercise = group['日常運動得分'].sum()
-                total_diet = group['飲食得分'].sum()
-                total_bonus = group['個人Bonus得分'].sum()
-                total_club = group['參加社團得分'].sum()
-                total_score = total_exercise + total_diet + total_bonus + total_club
-                
-                # 組合儀表板格式的資料
-                dashboard_row = {
-                    '姓名': name,
-                    '性別': gender,
-                    '所屬部門': department,
-                    'total': total_score,
-                    '日常運動總分': total_exercise,
-                    '飲食總分': total_diet,
-                    'Bonus總分': total_bonus,
-                    '社團活動總分': total_club,
-                    '日常運動總次數': group['日常運動次數'].sum(),
-                    '飲食總次數': group['飲食次數'].sum(),
-                    'Bonus總次數': group['個人Bonus次數'].sum(),
-                    '社團活動總次數': group['參加社團次數'].sum()
-                }
-                
-                # 添加期間分解資料
-                for _, period_row in group.iterrows():
-                    period = period_row['回合期間']
-                    if '8/8' in period:
-                        suffix = '_期間1'
-                    elif '8/31' in period:
-                        suffix = '_期間2'
-                    else:
-                        suffix = f"_{period}"
-                    
-                    dashboard_row[f'日常運動得分{suffix}'] = period_row['日常運動得分']
-                    dashboard_row[f'飲食得分{suffix}'] = period_row['飲食得分']
-                    dashboard_row[f'個人Bonus得分{suffix}'] = period_row['個人Bonus得分']
-                    dashboard_row[f'社團活動得分{suffix}'] = period_row['參加社團得分']
-                    dashboard_row[f'total{suffix}'] = (period_row['日常運動得分'] + 
-                                                     period_row['飲食得分'] + 
-                                                     period_row['個人Bonus得分'] + 
-                                                     period_row['參加社團得分'])
-                
-                dashboard_data.append(dashboard_row)
+            # 從帳號整理取得基本資訊（找不到帳號時為空字串）
+            def account_field(columns):
+                for col in columns:
+                    if col in account_info.columns:
+                        return account_info[col].reindex(participant_ids.values, fill_value='').values
+                return ''
             
-            # 轉換為DataFrame
-            df = pd.DataFrame(dashboard_data)
+            df = pd.DataFrame({
+                '性別': account_field(['性別']),
+                '所屬部門': account_field(['所屬部門', '部門', 'department']),
+            }, index=totals.index)
+            df['total'] = totals[['日常運動得分', '飲食得分', '個人Bonus得分', '參加社團得分']].sum(axis=1)
+            df = df.join(totals.rename(columns={
+                source: target for target, source in LEGACY_SCORE_COLUMNS.items()
+            })[list(LEGACY_SCORE_COLUMNS)])
+            
+            # 添加期間分解資料（每個期間一組欄位）
+            periods = participant_stats['回合期間'].drop_duplicates()
+            for period in periods:
+                if '8/8' in period:
+                    suffix = '_期間1'
+                elif '8/31' in period:
+                    suffix = '_期間2'
+                else:
+                    suffix = f"_{period}"
+                
+                period_rows = (participant_stats[participant_stats['回合期間'] == period]
+                               .drop_duplicates('姓名', keep='last')
+                               .set_index('姓名'))
+                period_scores = period_rows[['日常運動得分', '飲食得分', '個人Bonus得分', '參加社團得分']]
+                period_scores = period_scores.rename(columns={'參加社團得分': '社團活動得分'})
+                period_scores['total'] = period_scores.sum(axis=1)
+                df = df.join(period_scores.add_suffix(suffix))
             
             # 填充缺失值
-            df = df.fillna(0)
+            df = df.reset_index().fillna(0)
             
-            print(f"格式轉換完成：{len(df)} 位參賽者")
+            logger.info("格式轉換完成：%d 位參賽者", len(df))
             return df
             
         except Exception as e:
-            print(f"格式轉換失敗：{str(e)}")
+            logger.warning("格式轉換失敗：%s", e)
             import traceback
             traceback.print_exc()
             return None
@@ -182,43 +253,12 @@ class DataLoader:
     def _convert_to_dashboard_format_new(self, participant_stats):
         """將新的參加者活動統計表轉換為儀表板格式"""
         try:
-            # participant_stats 已經是正確格式的 DataFrame
-            # 欄位: id, 姓名, 性別, 所屬部門, 運動總得分, 運動總次數, 飲食總得分, 飲食總次數,
-            #      Bonus總得分, Bonus總次數, 社團總得分, 社團總次數, total, 期間1分數, 期間2分數
-
-            dashboard_data = []
-
-            for _, row in participant_stats.iterrows():
-                dashboard_row = {
-                    '姓名': row['姓名'],
-                    '性別': row['性別'],
-                    '所屬部門': row['所屬部門'],
-                    'total': row['total'],
-                    '日常運動總分': row['運動總得分'],
-                    '飲食總分': row['飲食總得分'],
-                    'Bonus總分': row['Bonus總得分'],
-                    '社團活動總分': row['社團總得分'],
-                    '日常運動總次數': row['運動總次數'],
-                    '飲食總次數': row['飲食總次數'],
-                    'Bonus總次數': row['Bonus總次數'],
-                    '社團活動總次數': row['社團總次數'],
-                    # 期間分解
-                    'total_期間1': row['期間1分數'],
-                    'total_期間2': row['期間2分數']
-                }
-                dashboard_data.append(dashboard_row)
-
-            # 轉換為DataFrame
-            df = pd.DataFrame(dashboard_data)
-
-            # 填充缺失值
-            df = df.fillna(0)
-
-            print(f"新格式轉換完成：{len(df)} 位參賽者")
+            df = to_dashboard_frame(participant_stats)
+            logger.info("新格式轉換完成：%d 位參賽者", len(df))
             return df
 
         except Exception as e:
-            print(f"新格式轉換失敗：{str(e)}")
+            logger.warning("新格式轉換失敗：%s", e)
             import traceback
             traceback.print_exc()
             return None
@@ -226,41 +266,12 @@ class DataLoader:
     def _convert_to_dashboard_format_correct(self, participant_stats):
         """將修正後的參加者活動統計表轉換為儀表板格式"""
         try:
-            # participant_stats 已經是正確格式的 DataFrame
-            # 直接使用並重新組織為儀表板需要的格式
-            dashboard_data = []
-            
-            for _, row in participant_stats.iterrows():
-                dashboard_row = {
-                    '姓名': row['姓名'],
-                    '性別': row['性別'],
-                    '所屬部門': row['所屬部門'],
-                    'total': row['total'],
-                    '日常運動總分': row['運動總得分'],
-                    '飲食總分': row['飲食總得分'],
-                    'Bonus總分': row['Bonus總得分'],
-                    '社團活動總分': row['社團總得分'],
-                    '日常運動總次數': row['運動總次數'],
-                    '飲食總次數': row['飲食總次數'],
-                    'Bonus總次數': row['Bonus總次數'],
-                    '社團活動總次數': row['社團總次數'],
-                    # 期間分解
-                    'total_期間1': row['期間1分數'],
-                    'total_期間2': row['期間2分數']
-                }
-                dashboard_data.append(dashboard_row)
-            
-            # 轉換為DataFrame
-            df = pd.DataFrame(dashboard_data)
-            
-            # 填充缺失值
-            df = df.fillna(0)
-            
-            print(f"修正格式轉換完成：{len(df)} 位參賽者")
+            df = to_dashboard_frame(participant_stats)
+            logger.info("修正格式轉換完成：%d 位參賽者", len(df))
             return df
             
         except Exception as e:
-            print(f"修正格式轉換失敗：{str(e)}")
+            logger.warning("修正格式轉換失敗：%s", e)
             import traceback
             traceback.print_exc()
             return None
@@ -352,6 +363,7 @@ class DataLoader:
         
         return True, []  # 驗證通過
     
+    @timed_stage('清理資料')
     def clean_data(self, df):
         """清理資料"""
         if df is None:
@@ -380,13 +392,11 @@ class DataLoader:
         """獲取檔案最後更新時間（台灣時區）"""
         try:
             latest_time = None
-            taipei_tz = pytz.timezone('Asia/Taipei')
             
             for file_path in self.file_paths:
                 if os.path.exists(file_path):
                     timestamp = os.path.getmtime(file_path)
-                    utc_time = datetime.utcfromtimestamp(timestamp).replace(tzinfo=pytz.UTC)
-                    file_time = utc_time.astimezone(taipei_tz)
+                    file_time = datetime.fromtimestamp(timestamp, TAIPEI_TZ)
                     
                     if latest_time is None or file_time > latest_time:
                         latest_time = file_time
@@ -432,38 +442,28 @@ class DataLoader:
         
         return score_details
     
-    def get_statistics(self, df):
-        """獲取統計資訊"""
+    @timed_stage('統計資訊')
+    def get_statistics(self, df, snapshot=None):
+        """獲取統計資訊（snapshot 已預先讀取活動統計分析報告時直接使用）"""
         # 計算基本統計
         total_registrants = len(df)  # 報名人數：所有在名單裡的人
         
-        # 實際參與人數：使用報告的標準（87人）
-        actual_participants_count = 87  # 以報告統計摘要為準
+        # 實際參與人數：預設為分數>0的人數
+        active_participants = df[df['total'] > 0] if 'total' in df.columns else df
+        actual_participants_count = len(active_participants)
         
-        # 嘗試從活動統計分析報告讀取精確數據
+        # 有活動統計分析報告時以報告為準（報告依內容雜湊快取，不會每次重新讀取）
         try:
-            import os
-            report_path = 'data/活動統計分析報告.xlsx'
-            if os.path.exists(report_path):
-                report_summary = pd.read_excel(report_path, sheet_name='統計摘要')
-                report_individual = pd.read_excel(report_path, sheet_name='個人總計統計')
-                
+            report_path = os.path.join(self.project_root, 'data', '活動統計分析報告.xlsx')
+            report = load_report_summary(report_path, snapshot)
+            if report is not None:
                 # 從報告中獲取實際參與人數
-                for _, row in report_summary.iterrows():
-                    if row['統計項目'] == '參賽者總數':
-                        actual_participants_count = int(row['數值'])
-                        break
+                if report['participant_count'] is not None:
+                    actual_participants_count = report['participant_count']
                 
                 # 使用報告中的參賽者名單來計算性別分布
                 if '姓名' in df.columns:
-                    report_names = set(report_individual['姓名'].tolist())
-                    active_participants = df[df['姓名'].isin(report_names)]
-                else:
-                    active_participants = df[df['total'] > 0] if 'total' in df.columns else df
-            else:
-                # 如果報告不存在，使用分數>0的邏輯
-                active_participants = df[df['total'] > 0] if 'total' in df.columns else df
-                actual_participants_count = len(active_participants)
+                    active_participants = df[df['姓名'].isin(report['names'])]
                 
         except Exception:
             # 如果讀取報告失敗，使用分數>0的邏輯
@@ -528,49 +528,25 @@ class DataLoader:
         
         return stats
     
-    def get_activity_analyzer(self):
-        """取得活動分析器"""
-        if self.activity_analyzer is None:
+    @timed_stage('活動分析器')
+    def get_activity_analyzer(self, snapshot=None):
+        """取得活動分析器（與儀表板共用同一份資料快照，省略時取目前的快照）"""
+        if snapshot is None:
+            snapshot = self.get_snapshot()
+        reuse = self.activity_analyzer is not None and self.activity_analyzer.processor is snapshot
+        mark_cache_hit(reuse)
+        if not reuse:
             try:
                 # 使用新的活動分析器
                 from new_activity_analyzer import NewActivityAnalyzer
-                # 使用新的processor
-                processor_to_use = self.new_processor if hasattr(self, 'new_processor') and self.new_processor else None
-                if processor_to_use is None:
-                    # 如果沒有processor，建立一個新的
-                    from new_data_processor import NewDataProcessor
-                    processor_to_use = NewDataProcessor(self.file_paths[0])
-                    processor_to_use.load_account_info()
-                    processor_to_use.load_period_data('0808-0830')
-                    processor_to_use.load_period_data('0831-0921')
-                    # 建立社團活動明細
-                    all_club_details = []
-                    for sheet_name, df in processor_to_use.period_data.items():
-                        club_df = processor_to_use.transform_club_activities(df, sheet_name)
-                        all_club_details.append(club_df)
-                    processor_to_use.club_details = pd.concat(all_club_details, ignore_index=True)
-
-                self.activity_analyzer = NewActivityAnalyzer(processor_to_use)
             except ImportError:
                 # 如果相對導入失敗，嘗試絕對導入
                 import sys
-                import os
                 current_dir = os.path.dirname(os.path.abspath(__file__))
                 sys.path.insert(0, current_dir)
                 from new_activity_analyzer import NewActivityAnalyzer
-                from new_data_processor import NewDataProcessor
-
-                processor_to_use = self.new_processor if hasattr(self, 'new_processor') and self.new_processor else None
-                if processor_to_use is None:
-                    processor_to_use = NewDataProcessor(self.file_paths[0])
-                    processor_to_use.load_account_info()
-                    processor_to_use.load_period_data('0808-0830')
-                    processor_to_use.load_period_data('0831-0921')
-                    all_club_details = []
-                    for sheet_name, df in processor_to_use.period_data.items():
-                        club_df = processor_to_use.transform_club_activities(df, sheet_name)
-                        all_club_details.append(club_df)
-                    processor_to_use.club_details = pd.concat(all_club_details, ignore_index=True)
-
-                self.activity_analyzer = NewActivityAnalyzer(processor_to_use)
+
+            analyzer = NewActivityAnalyzer(snapshot)
+            analyzer.load_detailed_data()
+            self.activity_analyzer = analyzer
         return self.activity_analyzer
@@ -0,0 +1,104 @@
+"""
+資料表欄位型別定義
+資料快照建立時統一套用精簡的欄位型別，降低每份資料在記憶體中的佔用
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# 重複值多的文字欄位：以 category 儲存
+CATEGORY_COLUMNS = ('性別', '所屬部門', '回合期間', '參加社團')
+
+# 每筆不同的識別文字欄位：以 Arrow 字串儲存
+STRING_COLUMNS = ('id', '姓名')
+
+# 分數與次數欄位（例如 日常運動得分、飲食次數、社團總得分、期間1分數、total）
+SCORE_COLUMN_PATTERN = re.compile(r'(得分|次數|分數|總分|^total.*)$')
+
+_INT32_MIN = np.iinfo(np.int32).min
+_INT32_MAX = np.iinfo(np.int32).max
+
+
+def _string_dtype():
+    """Arrow 字串型別；環境不支援時維持 object"""
+    try:
+        import pyarrow  # noqa: F401
+        return pd.StringDtype('pyarrow', na_value=np.nan)
+    except (ImportError, TypeError):
+        return object
+
+
+def _compact_numeric(series):
+    """整數值的分數欄位轉為 int32；有缺值或小數時維持原型別"""
+    if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return series
+    values = series.to_numpy()
+    if len(values) == 0:
+        return series.astype(np.int32)
+    if not np.isfinite(values).all() or (values != np.round(values)).any():
+        return series
+    if values.min() < _INT32_MIN or values.max() > _INT32_MAX:
+        return series
+    return series.astype(np.int32)
+
+
+def apply_schema(df):
+    """依欄位名稱套用精簡型別，回傳新的 DataFrame（不修改原資料）"""
+    if df is None:
+        return None
+
+    df = df.copy()
+    string_dtype = _string_dtype()
+    for col in df.columns:
+        if not isinstance(col, str):
+            continue
+        if col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype('category')
+        elif col in STRING_COLUMNS:
+            df[col] = df[col].astype(string_dtype)
+        elif SCORE_COLUMN_PATTERN.search(col):
+            df[col] = _compact_numeric(df[col])
+    return df
+
+
+def frame_memory(df):
+    """DataFrame 佔用的位元組數（含索引與字串內容）"""
+    if df is None:
+        return 0
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def memory_report(before, after):
+    """比較套用型別前後各資料表的記憶體用量
+
+    Args:
+        before: 名稱 → 套用前的 DataFrame
+        after: 名稱 → 套用後的 DataFrame
+
+    Returns:
+        DataFrame: 資料表、原始大小、精簡後大小、節省比例（位元組）
+    """
+    rows = []
+    for name, df in before.items():
+        original = frame_memory(df)
+        compact = frame_memory(after.get(name))
+        rows.append({
+            '資料表': name,
+            '原始大小': original,
+            '精簡後大小': compact,
+            '節省比例': 1 - compact / original if original else 0.0,
+        })
+
+    report = pd.DataFrame(rows, columns=['資料表', '原始大小', '精簡後大小', '節省比例'])
+    original_total = int(report['原始大小'].sum())
+    compact_total = int(report['精簡後大小'].sum())
+    report.loc[len(report)] = {
+        '資料表': '合計',
+        '原始大小': original_total,
+        '精簡後大小': compact_total,
+        '節省比例': 1 - compact_total / original_total if original_total else 0.0,
+    }
+    return report
@@ -5,17 +5,70 @@
 處理新EXCEL檔案結構的活動統計分析
 """
 
+import copy
+
 import pandas as pd
 import numpy as np
 from collections import defaultdict
 
+from pipeline_timing import logger
+
+
+def overall_statistics(participant_stats):
+    """計算整體活動統計（各活動總次數與參與人數）
+
+    Args:
+        participant_stats: 參加者活動統計表（每人每期間一筆），None 時回傳全為 0 的統計
+    """
+    if participant_stats is None:
+        return {
+            'exercise': {'total_count': 0, 'participants': 0},
+            'diet': {'total_count': 0, 'participants': 0},
+            'bonus': {'total_count': 0, 'participants': 0},
+            'club': {'total_activities': 0, 'participants': 0}
+        }
+    
+    # 按姓名聚合統計
+    stats_by_person = participant_stats.groupby('姓名').agg({
+        '日常運動次數': 'sum',
+        '飲食次數': 'sum',
+        '個人Bonus次數': 'sum',
+        '參加社團次數': 'sum'
+    }).reset_index()
+    
+    # 計算有參與各活動的人數
+    exercise_participants = len(stats_by_person[stats_by_person['日常運動次數'] > 0])
+    diet_participants = len(stats_by_person[stats_by_person['飲食次數'] > 0])
+    bonus_participants = len(stats_by_person[stats_by_person['個人Bonus次數'] > 0])
+    club_participants = len(stats_by_person[stats_by_person['參加社團次數'] > 0])
+    
+    return {
+        'exercise': {
+            'total_count': int(stats_by_person['日常運動次數'].sum()),
+            'participants': exercise_participants
+        },
+        'diet': {
+            'total_count': int(stats_by_person['飲食次數'].sum()),
+            'participants': diet_participants
+        },
+        'bonus': {
+            'total_count': int(stats_by_person['個人Bonus次數'].sum()),
+            'participants': bonus_participants
+        },
+        'club': {
+            'total_activities': int(stats_by_person['參加社團次數'].sum()),
+            'participants': club_participants
+        }
+    }
+
+
 class NewActivityAnalyzer:
     """新活動分析器"""
 
     def __init__(self, processor):
         """
         Args:
-            processor: NewDataProcessor 實例
+            processor: 資料快照（Snapshot）或 NewDataProcessor 實例
         """
         self.processor = processor
         self.participant_stats = None
@@ -23,7 +76,12 @@ class NewActivityAnalyzer:
 
     def load_detailed_data(self):
         """載入詳細資料"""
-        if self.processor:
+        if self.processor is not None and getattr(self.processor, 'participant_stats', None) is not None:
+            # 直接使用快照中的各期間參加者統計，不另外重建
+            self.participant_stats = self.processor.participant_stats
+            self.club_details = self.processor.club_details
+            logger.info("活動分析器載入完成，分析 %d 筆期間資料", len(self.participant_stats))
+        elif self.processor:
             # 從processor取得參加者活動統計表
             import os
             import pandas as pd
@@ -35,88 +93,45 @@ class NewActivityAnalyzer:
             stats_df = pd.read_excel(stats_path)
 
             # 轉換為期間明細格式以配合原有邏輯
+            from new_data_processor import period_score_columns
+            period_cols = period_score_columns(stats_df)
+            period_names = list(self.processor.period_data) if getattr(self.processor, 'period_data', None) else []
+
+            share_cols = {
+                '日常運動得分': '運動總得分',
+                '日常運動次數': '運動總次數',
+                '飲食得分': '飲食總得分',
+                '飲食次數': '飲食總次數',
+                '個人Bonus得分': 'Bonus總得分',
+                '個人Bonus次數': 'Bonus總次數',
+                '參加社團得分': '社團總得分',
+                '參加社團次數': '社團總次數',
+            }
+
             period_data = []
             for _, row in stats_df.iterrows():
-                # 期間1資料
-                if row['期間1分數'] > 0:
-                    period_row = {
-                        'id': row['id'],
-                        '姓名': row['姓名'],
-                        '回合期間': '0808-0830',
-                        '日常運動得分': row['運動總得分'] * (row['期間1分數'] / row['total']) if row['total'] > 0 else 0,
-                        '日常運動次數': row['運動總次數'] * (row['期間1分數'] / row['total']) if row['total'] > 0 else 0,
-                        '飲食得分': row['飲食總得分'] * (row['期間1分數'] / row['total']) if row['total'] > 0 else 0,
-                        '飲食次數': row['飲食總次數'] * (row['期間1分數'] / row['total']) if row['total'] > 0 else 0,
-                        '個人Bonus得分': row['Bonus總得分'] * (row['期間1分數'] / row['total']) if row['total'] > 0 else 0,
-                        '個人Bonus次數': row['Bonus總次數'] * (row['期間1分數'] / row['total']) if row['total'] > 0 else 0,
-                        '參加社團得分': row['社團總得分'] * (row['期間1分數'] / row['total']) if row['total'] > 0 else 0,
-                        '參加社團次數': row['社團總次數'] * (row['期間1分數'] / row['total']) if row['total'] > 0 else 0,
-                    }
-                    period_data.append(period_row)
-
-                # 期間2資料
-                if row['期間2分數'] > 0:
-                    period_row = {
-                        'id': row['id'],
-                        '姓名': row['姓名'],
-                        '回合期間': '0831-0921',
-                        '日常運動得分': row['運動總得分'] * (row['期間2分數'] / row['total']) if row['total'] > 0 else 0,
-                        '日常運動次數': row['運動總次數'] * (row['期間2分數'] / row['total']) if row['total'] > 0 else 0,
-                        '飲食得分': row['飲食總得分'] * (row['期間2分數'] / row['total']) if row['total'] > 0 else 0,
-                        '飲食次數': row['飲食總次數'] * (row['期間2分數'] / row['total']) if row['total'] > 0 else 0,
-                        '個人Bonus得分': row['Bonus總得分'] * (row['期間2分數'] / row['total']) if row['total'] > 0 else 0,
-                        '個人Bonus次數': row['Bonus總次數'] * (row['期間2分數'] / row['total']) if row['total'] > 0 else 0,
-                        '參加社團得分': row['社團總得分'] * (row['期間2分數'] / row['total']) if row['total'] > 0 else 0,
-                        '參加社團次數': row['社團總次數'] * (row['期間2分數'] / row['total']) if row['total'] > 0 else 0,
-                    }
-                    period_data.append(period_row)
+                for k, period_col in enumerate(period_cols):
+                    # 各期間資料（依期間分數佔總分比例分攤）
+                    if row[period_col] > 0:
+                        period_row = {
+                            'id': row['id'],
+                            '姓名': row['姓名'],
+                            '回合期間': period_names[k] if k < len(period_names) else period_col,
+                        }
+                        for target, source in share_cols.items():
+                            period_row[target] = row[source] * (row[period_col] / row['total']) if row['total'] > 0 else 0
+                        period_data.append(period_row)
 
             self.participant_stats = pd.DataFrame(period_data)
             self.club_details = self.processor.club_details
-            print(f"活動分析器載入完成，分析 {len(self.participant_stats) if self.participant_stats is not None else 0} 筆期間資料")
+            logger.info("活動分析器載入完成，分析 %d 筆期間資料", len(self.participant_stats) if self.participant_stats is not None else 0)
     
     def get_overall_statistics(self):
-        """取得整體活動統計"""
-        if self.participant_stats is None:
-            return {
-                'exercise': {'total_count': 0, 'participants': 0},
-                'diet': {'total_count': 0, 'participants': 0},
-                'bonus': {'total_count': 0, 'participants': 0},
-                'club': {'total_activities': 0, 'participants': 0}
-            }
-        
-        # 按姓名聚合統計
-        stats_by_person = self.participant_stats.groupby('姓名').agg({
-            '日常運動次數': 'sum',
-            '飲食次數': 'sum',
-            '個人Bonus次數': 'sum',
-            '參加社團次數': 'sum'
-        }).reset_index()
-        
-        # 計算有參與各活動的人數
-        exercise_participants = len(stats_by_person[stats_by_person['日常運動次數'] > 0])
-        diet_participants = len(stats_by_person[stats_by_person['飲食次數'] > 0])
-        bonus_participants = len(stats_by_person[stats_by_person['個人Bonus次數'] > 0])
-        club_participants = len(stats_by_person[stats_by_person['參加社團次數'] > 0])
-        
-        return {
-            'exercise': {
-                'total_count': int(stats_by_person['日常運動次數'].sum()),
-                'participants': exercise_participants
-            },
-            'diet': {
-                'total_count': int(stats_by_person['飲食次數'].sum()),
-                'participants': diet_participants
-            },
-            'bonus': {
-                'total_count': int(stats_by_person['個人Bonus次數'].sum()),
-                'participants': bonus_participants
-            },
-            'club': {
-                'total_activities': int(stats_by_person['參加社團次數'].sum()),
-                'participants': club_participants
-            }
-        }
+        """取得整體活動統計（資料快照已預先計算時直接使用）"""
+        precomputed = getattr(self.processor, 'overall_statistics', None)
+        if precomputed is not None and self.participant_stats is getattr(self.processor, 'participant_stats', None):
+            return copy.deepcopy(precomputed)
+        return overall_statistics(self.participant_stats)
     
     def get_person_details(self, name):
         """取得個人詳細資料"""
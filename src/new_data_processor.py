@@ -5,15 +5,381 @@
 
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 from datetime import datetime
+import hashlib
+import itertools
+import json
 import os
+import re
+import shutil
+
+from pipeline_timing import logger
+
+
+# 已解析的工作簿（路徑 → (檔案版本, 所有工作表)），讓多個處理器共用同一份解析結果；
+# 每個路徑只保留最新版本，建立資料快照後由 release_workbook 釋放
+_workbook_cache = {}
+
+# 欄式快取目錄（相對於專案根目錄）
+CACHE_DIR = os.path.join('data', '.cache')
+
+
+def _project_root():
+    """取得專案根目錄（src 的上一層）"""
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """計算檔案內容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def workbook_fingerprint(excel_path, content_hash=None):
+    """取得工作簿的版本資訊（大小、修改時間、內容雜湊）
+
+    content_hash 為 None 時才重新計算雜湊。
+    """
+    stat = os.stat(excel_path)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': content_hash or file_sha256(excel_path),
+    }
+
+
+def _normalize_for_columnar(df):
+    """將混合型別的欄位（如同時有文字與數字）統一為文字，使其可寫入 Parquet"""
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) in ('mixed', 'mixed-integer'):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str)).infer_objects()
+    return df
+
+
+def period_score_column(k):
+    """第 k 個回合期間（從 1 起算）的分數欄位名稱"""
+    return f"期間{k}分數"
+
+
+def period_score_columns(df):
+    """依期間順序列出表格中所有「期間k分數」欄位"""
+    numbered = []
+    for col in df.columns:
+        match = re.fullmatch(r'期間(\d+)分數', col) if isinstance(col, str) else None
+        if match:
+            numbered.append((int(match.group(1)), col))
+    return [col for _, col in sorted(numbered)]
+
+
+def summarize_club_details(club_details):
+    """按參加者與回合期間彙總社團活動得分與次數"""
+    club_stats = club_details.groupby(['id', '姓名', '回合期間']).agg({
+        '得分': 'sum',
+        '參加社團': 'count'
+    }).reset_index()
+    club_stats.columns = ['id', '姓名', '回合期間', '參加社團得分', '參加社團次數']
+    return club_stats
+
+
+def process_period_sheet(df, sheet_name):
+    """處理單一期間工作表（可在子程序中執行）
+
+    Returns:
+        dict: basic（運動、飲食、Bonus分數與次數）、club（社團活動明細）、club_stats（社團活動統計）
+    """
+    processor = NewDataProcessor()
+    basic_stats = processor.extract_score_and_count(df, sheet_name)
+    club_details = processor.transform_club_activities(df, sheet_name)
+    return {
+        'basic': basic_stats,
+        'club': club_details,
+        'club_stats': summarize_club_details(club_details),
+    }
+
+
+class WorkbookCache:
+    """工作簿欄式快取
+
+    將每個工作表存成 Parquet 檔，並以工作簿的大小、修改時間與內容雜湊作為版本鍵。
+    工作簿未變更時直接讀取 Parquet，變更時自動重建。
+    """
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, excel_path, cache_dir=CACHE_DIR):
+        if not os.path.isabs(cache_dir):
+            cache_dir = os.path.join(_project_root(), cache_dir)
+        stem = os.path.splitext(os.path.basename(excel_path))[0]
+        self.excel_path = excel_path
+        self.cache_dir = os.path.join(cache_dir, stem)
+
+    @staticmethod
+    def is_available():
+        """是否可使用 Parquet（需要 pyarrow）"""
+        try:
+            import pyarrow  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.cache_dir, self.MANIFEST), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, manifest):
+        path = os.path.join(self.cache_dir, self.MANIFEST)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def load(self):
+        """工作簿未變更時回傳快取的所有工作表，否則回傳 None"""
+        manifest = self._read_manifest()
+        if not isinstance(manifest, dict):
+            return None
+        try:
+            size, mtime_ns, sha256, sheets = (
+                manifest['size'], manifest['mtime_ns'], manifest['sha256'], manifest['sheets']
+            )
+        except KeyError:
+            # 清單不完整（寫入中斷或被手動修改）視為未命中
+            return None
+
+        stat = os.stat(self.excel_path)
+        if stat.st_size != size:
+            return None
+
+        if stat.st_mtime_ns != mtime_ns:
+            # 修改時間不同但內容可能相同（例如重新複製檔案），以內容雜湊確認
+            if file_sha256(self.excel_path) != sha256:
+                return None
+            manifest['mtime_ns'] = stat.st_mtime_ns
+            self._write_manifest(manifest)
+
+        try:
+            return {
+                sheet_name: pd.read_parquet(os.path.join(self.cache_dir, file_name))
+                for sheet_name, file_name in sheets
+            }
+        except Exception as e:
+            logger.warning("讀取工作簿快取失敗，改為重新解析：%s", e)
+            return None
+
+    def save(self, sheets, fingerprint):
+        """將所有工作表寫入快取
+
+        覆寫工作表檔案前先移除清單，寫入中途失敗時快取只會是未命中，
+        不會留下指向新舊混合檔案的舊清單。
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        try:
+            os.remove(os.path.join(self.cache_dir, self.MANIFEST))
+        except FileNotFoundError:
+            pass
+
+        sheet_files = []
+        for i, (sheet_name, df) in enumerate(sheets.items()):
+            file_name = f"{i:02d}.parquet"
+            df.to_parquet(os.path.join(self.cache_dir, file_name))
+            sheet_files.append([sheet_name, file_name])
+
+        self._write_manifest(dict(fingerprint, sheets=sheet_files))
+
+
+def sheet_content_hash(df):
+    """計算工作表儲存格內容（含欄位名稱）的雜湊，用來判斷該表是否變更"""
+    digest = hashlib.sha256()
+    digest.update(f"v{SheetResultStore.VERSION}".encode())
+    digest.update(repr([str(col) for col in df.columns]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class SheetResultStore:
+    """各期間工作表處理結果（中間表）的儲存區
+
+    以工作表內容雜湊為鍵，將基本統計、社團明細與社團統計存成 Parquet，
+    工作簿更新時只需重新計算內容有變更的工作表。
+    """
+
+    # 處理邏輯變更時遞增，使舊的中間表失效
+    VERSION = 1
+    TABLES = ('basic', 'club', 'club_stats')
+
+    def __init__(self, excel_path, cache_dir=CACHE_DIR):
+        self.store_dir = os.path.join(WorkbookCache(excel_path, cache_dir).cache_dir, 'sheet_results')
+
+    def load(self, content_hash):
+        """回傳先前儲存的處理結果，不存在則回傳 None"""
+        result_dir = os.path.join(self.store_dir, content_hash)
+        if not os.path.isdir(result_dir):
+            return None
+        try:
+            result = {
+                table: pd.read_parquet(os.path.join(result_dir, f"{table}.parquet"))
+                for table in self.TABLES
+            }
+        except Exception as e:
+            logger.warning("讀取工作表中間結果失敗：%s", e)
+            return None
+        result['hash'] = content_hash
+        return result
+
+    def save(self, content_hash, result):
+        """儲存單一工作表的處理結果"""
+        result_dir = os.path.join(self.store_dir, content_hash)
+        tmp_dir = result_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for table in self.TABLES:
+            result[table].to_parquet(os.path.join(tmp_dir, f"{table}.parquet"))
+        shutil.rmtree(result_dir, ignore_errors=True)
+        os.replace(tmp_dir, result_dir)
+
+    def prune(self, keep_hashes):
+        """移除目前工作簿已不再使用的中間結果"""
+        if not os.path.isdir(self.store_dir):
+            return
+        for name in os.listdir(self.store_dir):
+            if name not in keep_hashes:
+                shutil.rmtree(os.path.join(self.store_dir, name), ignore_errors=True)
+
+
+def _dedupe_columns(header):
+    """整理表頭：空白欄位命名為「Unnamed: i」，重複名稱加上「.1」「.2」…（與 pd.read_excel 一致）"""
+    columns = []
+    seen = {}
+    for i, name in enumerate(header):
+        if name is None:
+            name = f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def _records_frame(records, columns):
+    """將逐列讀取的資料轉為 DataFrame（完全空白的欄位與 pd.read_excel 相同，轉為 float64 的 NaN）"""
+    df = pd.DataFrame.from_records(records, columns=columns).infer_objects()
+    for col in df.columns[df.isna().all().to_numpy()]:
+        df[col] = df[col].astype('float64')
+    return df
+
+
+def list_sheet_names(excel_path):
+    """只讀取工作簿的工作表名稱（不解析儲存格）"""
+    from openpyxl import load_workbook
+    workbook = load_workbook(excel_path, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def iter_sheet_chunks(excel_path, sheet_name, chunk_size=5000):
+    """以 openpyxl 唯讀模式逐列讀取工作表，每次產生最多 chunk_size 列的 DataFrame
+
+    第一列為表頭；完全空白的列會略過。任一時刻只保留一批資料在記憶體中。
+    """
+    from openpyxl import load_workbook
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        columns = _dedupe_columns(header)
+        width = len(columns)
+        buffer = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            buffer.append(row[:width] + (None,) * (width - len(row)))
+            if len(buffer) >= chunk_size:
+                yield _records_frame(buffer, columns)
+                buffer = []
+
+        if buffer:
+            yield _records_frame(buffer, columns)
+    finally:
+        workbook.close()
+
+
+def read_workbook(excel_path, use_cache=True):
+    """一次讀入工作簿的所有工作表
+
+    同一版本的檔案只解析一次，之後的呼叫直接回傳已解析的 DataFrame；
+    跨程序重啟時則優先讀取欄式快取，工作簿變更後才重新解析 Excel。
+    """
+    stat = os.stat(excel_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _workbook_cache.get(excel_path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    cache = WorkbookCache(excel_path) if use_cache and WorkbookCache.is_available() else None
+
+    sheets = cache.load() if cache is not None else None
+    if sheets is not None:
+        logger.info("工作簿快取命中：%d 個工作表", len(sheets))
+    else:
+        fingerprint = workbook_fingerprint(excel_path)
+        sheets = {
+            sheet_name: _normalize_for_columnar(df)
+            for sheet_name, df in pd.read_excel(excel_path, sheet_name=None).items()
+        }
+        logger.info("工作簿解析完成：%d 個工作表", len(sheets))
+
+        if cache is not None:
+            try:
+                cache.save(sheets, fingerprint)
+            except Exception as e:
+                logger.warning("寫入工作簿快取失敗：%s", e)
+
+    _workbook_cache[excel_path] = (version, sheets)
+    return sheets
+
+
+def release_workbook(excel_path):
+    """釋放已解析的工作簿（原始工作表已轉入資料快照後不需再保留）"""
+    _workbook_cache.pop(excel_path, None)
 
 
 class NewDataProcessor:
     """新的資料處理器"""
 
-    def __init__(self, excel_path='data/每周分數累積.xlsx'):
-        """初始化"""
+    # 期間工作表名稱格式，例如「0808-0830」
+    PERIOD_SHEET_PATTERN = re.compile(r'^\d{4}-\d{4}$')
+
+    # 串流模式每批讀取的列數
+    STREAM_CHUNK_ROWS = 5000
+
+    # 工作表總儲存格數低於此值時逐一處理，避免子程序啟動成本大於平行處理的效益
+    PARALLEL_MIN_CELLS = 200_000
+
+    def __init__(self, excel_path='data/每周分數累積.xlsx', use_cache=True, streaming=False):
+        """初始化
+
+        Args:
+            excel_path: 每周分數累積工作簿路徑
+            use_cache: 是否使用欄式快取與各工作表的中間結果
+            streaming: 是否以串流模式逐批讀取工作表（超大工作簿時限制記憶體用量）
+        """
         # 取得專案根目錄
         current_dir = os.path.dirname(os.path.abspath(__file__))
         project_root = os.path.dirname(current_dir)
@@ -27,116 +393,136 @@ class NewDataProcessor:
         self.club_details = None  # 社團活動明細表
         self.participant_stats = None  # 參加者活動統計表
         self.account_info = None  # 帳號整理資料
+        self.sheets = None  # 工作簿所有工作表（只解析一次）
+        self.sheet_results = {}  # 各期間工作表的處理結果（含內容雜湊）
+        self.use_cache = use_cache
+        self.streaming = streaming
+
+    def load_workbook(self):
+        """解析工作簿（所有工作表一次讀入）"""
+        if self.sheets is None:
+            self.sheets = read_workbook(self.excel_path, use_cache=self.use_cache)
+        return self.sheets
 
     def load_account_info(self):
         """載入帳號整理資料"""
         try:
-            df = pd.read_excel(self.excel_path, sheet_name='帳號整理')
+            if self.streaming:
+                df = _normalize_for_columnar(pd.concat(
+                    iter_sheet_chunks(self.excel_path, '帳號整理', self.STREAM_CHUNK_ROWS), ignore_index=True
+                ))
+            else:
+                df = self.load_workbook()['帳號整理']
             # 使用「帳號(最新8/8)2」作為key
             if '帳號(最新8/8)2' in df.columns:
                 df = df.set_index('帳號(最新8/8)2')
             self.account_info = df
-            print(f"帳號整理載入完成：{len(df)} 筆")
+            logger.info("帳號整理載入完成：%d 筆", len(df))
             return df
         except Exception as e:
-            print(f"載入帳號整理失敗：{str(e)}")
+            logger.warning("載入帳號整理失敗：%s", e)
             return None
 
+    def discover_period_sheets(self):
+        """依名稱格式（MMDD-MMDD）找出所有期間工作表"""
+        if self.streaming and self.sheets is None:
+            sheet_names = list_sheet_names(self.excel_path)
+        else:
+            sheet_names = list(self.load_workbook())
+        return [name for name in sheet_names if self.PERIOD_SHEET_PATTERN.match(str(name))]
+
+    def _period_names(self):
+        """目前處理中的期間工作表名稱（依工作簿順序）"""
+        return list(self.period_data) or list(self.sheet_results)
+
+    def load_all_periods(self):
+        """載入工作簿中所有期間工作表"""
+        for sheet_name in self.discover_period_sheets():
+            self.load_period_data(sheet_name)
+        return self.period_data
+
     def load_period_data(self, sheet_name):
         """載入期間工作表資料"""
         try:
-            df = pd.read_excel(self.excel_path, sheet_name=sheet_name)
+            df = self.load_workbook()[sheet_name]
 
             # 確認必要欄位存在
             required_cols = ['id', '姓名']
             for col in required_cols:
                 if col not in df.columns:
-                    print(f"警告：{sheet_name} 缺少必要欄位 {col}")
+                    logger.warning("%s 缺少必要欄位 %s", sheet_name, col)
                     return None
 
             # 儲存期間資料
             self.period_data[sheet_name] = df
-            print(f"{sheet_name} 載入完成：{len(df)} 筆資料")
+            logger.info("%s 載入完成：%d 筆資料", sheet_name, len(df))
             return df
 
         except Exception as e:
-            print(f"載入 {sheet_name} 失敗：{str(e)}")
+            logger.warning("載入 %s 失敗：%s", sheet_name, e)
+            return None
+
+    @staticmethod
+    def _resolve_score_columns(df):
+        """找出運動、飲食、Bonus欄位（支援不同期間的欄位名稱），每個工作表只需解析一次"""
+        def first_match(predicate):
+            for col in df.columns:
+                if isinstance(col, str) and predicate(col):
+                    return col
             return None
 
-    def extract_score_and_count(self, df, sheet_name):
+        return {
+            'exercise': first_match(lambda col: '日常運動' in col or '運動' in col),
+            'diet': first_match(lambda col: '飲食' in col),
+            'bonus': first_match(lambda col: 'bonus' in col.lower()),
+        }
+
+    def extract_score_and_count(self, df, sheet_name, score_cols=None):
         """從期間資料提取分數與次數
 
         A. 計算分數邏輯：
         1. 日常運動得分 ÷ 10 = 日常運動次數
         2. 飲食得分 ÷ 10 = 飲食次數
         3. 個人Bonus得分 ÷ 30 = 個人Bonus次數
-        """
-        results = []
-
-        for _, row in df.iterrows():
-            # 找出運動、飲食、Bonus欄位
-            exercise_col = None
-            diet_col = None
-            bonus_col = None
-
-            # 尋找欄位（支援不同期間的欄位名稱）
-            for col in df.columns:
-                if '日常運動' in col or '運動' in col:
-                    exercise_col = col
-                    break
-
-            for col in df.columns:
-                if '飲食' in col:
-                    diet_col = col
-                    break
-
-            for col in df.columns:
-                if 'bonus' in col.lower() or 'Bonus' in col:
-                    bonus_col = col
-                    break
-
-            # 計算分數與次數
-            exercise_score = row[exercise_col] if exercise_col and pd.notna(row[exercise_col]) else 0
-            diet_score = row[diet_col] if diet_col and pd.notna(row[diet_col]) else 0
-            bonus_score = row[bonus_col] if bonus_col and pd.notna(row[bonus_col]) else 0
-
-            # 計算次數
-            exercise_count = int(exercise_score / 10) if exercise_score > 0 else 0
-            diet_count = int(diet_score / 10) if diet_score > 0 else 0
-            bonus_count = int(bonus_score / 30) if bonus_score > 0 else 0
-
-            result = {
-                'id': row['id'],
-                '姓名': row['姓名'],
-                '回合期間': sheet_name,
-                '日常運動得分': exercise_score,
-                '日常運動次數': exercise_count,
-                '飲食得分': diet_score,
-                '飲食次數': diet_count,
-                '個人Bonus得分': bonus_score,
-                '個人Bonus次數': bonus_count
-            }
-
-            results.append(result)
-
-        return pd.DataFrame(results)
 
-    def transform_club_activities(self, df, sheet_name):
-        """將社團活動從Wide轉換為Long格式
-
-        B2. 社團活動Wide to Long轉換：
-        - 找出O欄開始到total欄前的所有社團活動欄位
-        - 解析欄位名稱取得日期和社團名稱
-        - 轉換日期格式（預設年份2025）
+        score_cols 可傳入已解析的欄位角色（串流處理時每個工作表只解析一次）。
         """
-        club_records = []
-
-        # 找出社團活動欄位（從個人bonus分之後到total之前）
+        if score_cols is None:
+            score_cols = self._resolve_score_columns(df)
+
+        def score_of(role):
+            col = score_cols[role]
+            if col is None:
+                return np.zeros(len(df))
+            return pd.to_numeric(df[col], errors='coerce').fillna(0).to_numpy()
+
+        def count_of(scores, unit):
+            return np.where(scores > 0, scores // unit, 0).astype(int)
+
+        exercise_score = score_of('exercise')
+        diet_score = score_of('diet')
+        bonus_score = score_of('bonus')
+
+        return pd.DataFrame({
+            'id': df['id'].to_numpy(),
+            '姓名': df['姓名'].to_numpy(),
+            '回合期間': sheet_name,
+            '日常運動得分': exercise_score,
+            '日常運動次數': count_of(exercise_score, 10),
+            '飲食得分': diet_score,
+            '飲食次數': count_of(diet_score, 10),
+            '個人Bonus得分': bonus_score,
+            '個人Bonus次數': count_of(bonus_score, 30),
+        })
+
+    @staticmethod
+    def _find_activity_columns(columns):
+        """找出社團活動欄位（從個人bonus分之後到total之前）"""
         activity_cols = []
         start_collecting = False
 
-        for col in df.columns:
-            if 'bonus' in col.lower():
+        for col in columns:
+            if 'bonus' in str(col).lower():
                 start_collecting = True
                 continue
             if col == 'total':
@@ -145,28 +531,53 @@ class NewDataProcessor:
                 # 所有bonus之後、total之前的欄位都視為社團活動
                 activity_cols.append(col)
 
-        print(f"{sheet_name} 找到 {len(activity_cols)} 個社團活動欄位")
+        return activity_cols
 
-        # 處理每個參加者
-        for _, row in df.iterrows():
-            for col in activity_cols:
-                score = row[col] if pd.notna(row[col]) else 0
-
-                # 只記錄有分數的活動
-                if score > 0:
-                    # 解析欄位名稱：例如 "8/13 羽球社" 或 "9/2 桌球社挑戰賽" 或 "人資講座"
-                    date_str, club_name = self._parse_activity_column(col, sheet_name)
+    def transform_club_activities(self, df, sheet_name, activity_cols=None):
+        """將社團活動從Wide轉換為Long格式
 
-                    club_records.append({
-                        'id': row['id'],
-                        '姓名': row['姓名'],
-                        '回合期間': sheet_name,
-                        '社團活動日期': date_str,
-                        '參加社團': club_name,
-                        '得分': score
-                    })
+        B2. 社團活動Wide to Long轉換：
+        - 找出O欄開始到total欄前的所有社團活動欄位
+        - 解析欄位名稱取得日期和社團名稱
+        - 轉換日期格式（預設年份2025）
 
-        return pd.DataFrame(club_records)
+        activity_cols 可傳入已找出的社團活動欄位（串流處理時每個工作表只找一次）。
+        """
+        if activity_cols is None:
+            activity_cols = self._find_activity_columns(df.columns)
+            logger.info("%s 找到 %d 個社團活動欄位", sheet_name, len(activity_cols))
+
+        output_cols = ['id', '姓名', '回合期間', '社團活動日期', '參加社團', '得分']
+        if not activity_cols:
+            return pd.DataFrame(columns=output_cols)
+
+        # 欄位對照表：每個活動欄位只解析一次日期與社團名稱
+        # 例如 "8/13 羽球社" 或 "9/2 桌球社挑戰賽" 或 "人資講座"
+        column_lookup = pd.DataFrame(
+            [(col, *self._parse_activity_column(col, sheet_name)) for col in activity_cols],
+            columns=['活動欄位', '社團活動日期', '參加社團']
+        )
+
+        # Wide → Long：每位參加者 × 每個活動欄位一列
+        wide = df[['id', '姓名'] + activity_cols].copy()
+        wide['_row'] = np.arange(len(wide))
+        long_df = wide.melt(
+            id_vars=['_row', 'id', '姓名'],
+            value_vars=activity_cols,
+            var_name='活動欄位',
+            value_name='得分'
+        )
+
+        # 只記錄有分數的活動
+        long_df['得分'] = pd.to_numeric(long_df['得分'], errors='coerce')
+        long_df = long_df[long_df['得分'] > 0]
+
+        # 維持依參加者、再依欄位順序排列
+        long_df = long_df.sort_values('_row', kind='stable')
+        long_df = long_df.merge(column_lookup, on='活動欄位', how='left')
+        long_df['回合期間'] = sheet_name
+
+        return long_df[output_cols].reset_index(drop=True)
 
     def _parse_activity_column(self, col_name, sheet_name):
         """解析社團活動欄位名稱
@@ -204,7 +615,7 @@ class NewDataProcessor:
                 elif sheet_name == '0831-0921':
                     date_str = '2025/09/10'
                 else:
-                    date_str = sheet_name
+                    date_str = self._period_start_date(sheet_name)
         except:
             # 解析失敗時使用期間日期
             if club_name == '人資講座':
@@ -214,10 +625,142 @@ class NewDataProcessor:
             elif sheet_name == '0831-0921':
                 date_str = '2025/09/10'
             else:
-                date_str = sheet_name
+                date_str = self._period_start_date(sheet_name)
 
         return date_str, club_name
 
+    def _period_start_date(self, sheet_name):
+        """期間工作表的起始日期（例如「0922-1012」→「2025/09/22」），非期間工作表則回傳名稱本身"""
+        if self.PERIOD_SHEET_PATTERN.match(str(sheet_name)):
+            return f"2025/{sheet_name[:2]}/{sheet_name[2:4]}"
+        return sheet_name
+
+    def process_period_sheets(self, max_workers=None):
+        """處理所有已載入的期間工作表並合併結果
+
+        以工作表內容雜湊判斷是否變更：未變更的工作表沿用先前的中間結果
+        （記憶體中或快取目錄），只重新計算有變更的工作表。
+        各工作表的分數萃取、社團活動轉換與統計彼此獨立，資料量大時以
+        ProcessPoolExecutor 平行處理；失敗時退回逐一處理。
+        """
+        sheets = list(self.period_data.items())
+        hashes = {sheet_name: sheet_content_hash(df) for sheet_name, df in sheets}
+        store = SheetResultStore(self.excel_path) if self.use_cache and WorkbookCache.is_available() else None
+
+        # 沿用內容未變更的工作表結果
+        results = {}
+        for sheet_name, _ in sheets:
+            previous = self.sheet_results.get(sheet_name)
+            if previous is not None and previous.get('hash') == hashes[sheet_name]:
+                results[sheet_name] = previous
+            elif store is not None:
+                stored = store.load(hashes[sheet_name])
+                if stored is not None:
+                    results[sheet_name] = stored
+
+        pending = [(sheet_name, df) for sheet_name, df in sheets if sheet_name not in results]
+        logger.info("期間工作表：沿用 %d 個，重新計算 %d 個", len(sheets) - len(pending), len(pending))
+
+        computed = {}
+        total_cells = sum(df.size for _, df in pending)
+        if len(pending) > 1 and total_cells >= self.PARALLEL_MIN_CELLS and max_workers != 1:
+            try:
+                # 以 spawn 啟動子程序：背景更新執行緒在多執行緒的伺服器中呼叫時，
+                # fork 可能複製到其他執行緒持有中的鎖而卡住
+                with ProcessPoolExecutor(max_workers=max_workers,
+                                         mp_context=multiprocessing.get_context('spawn')) as executor:
+                    futures = {
+                        sheet_name: executor.submit(process_period_sheet, df, sheet_name)
+                        for sheet_name, df in pending
+                    }
+                    computed = {sheet_name: future.result() for sheet_name, future in futures.items()}
+            except Exception as e:
+                logger.warning("平行處理失敗，改為逐一處理：%s", e)
+                computed = {}
+
+        for sheet_name, df in pending:
+            if sheet_name not in computed:
+                computed[sheet_name] = process_period_sheet(df, sheet_name)
+
+        for sheet_name, result in computed.items():
+            result['hash'] = hashes[sheet_name]
+            if store is not None:
+                try:
+                    store.save(hashes[sheet_name], result)
+                except Exception as e:
+                    logger.warning("儲存 %s 中間結果失敗：%s", sheet_name, e)
+        results.update(computed)
+
+        if store is not None:
+            store.prune(set(hashes.values()))
+
+        # 依工作簿中的期間順序合併
+        self.sheet_results = {sheet_name: results[sheet_name] for sheet_name, _ in sheets}
+        self.club_details = pd.concat(
+            [result['club'] for result in self.sheet_results.values()], ignore_index=True
+        )
+        logger.info("社團活動明細表建立完成：%d 筆資料", len(self.club_details))
+        return self.sheet_results
+
+    def _stream_period_sheet(self, sheet_name):
+        """以串流方式處理單一期間工作表
+
+        逐批讀入固定列數的資料並轉為數值型別，直接累積分數次數與社團活動明細（Long格式），
+        不保留完整的寬表，記憶體用量與工作表大小無關。
+        """
+        chunks = iter_sheet_chunks(self.excel_path, sheet_name, self.STREAM_CHUNK_ROWS)
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
+            logger.warning("%s 沒有資料", sheet_name)
+            return None
+
+        for col in ['id', '姓名']:
+            if col not in first_chunk.columns:
+                logger.warning("%s 缺少必要欄位 %s", sheet_name, col)
+                return None
+
+        # 欄位角色每個工作表只解析一次
+        score_cols = self._resolve_score_columns(first_chunk)
+        activity_cols = self._find_activity_columns(first_chunk.columns)
+        numeric_cols = [col for col in score_cols.values() if col is not None] + activity_cols
+        logger.info("%s 找到 %d 個社團活動欄位", sheet_name, len(activity_cols))
+
+        basic_parts = []
+        club_parts = []
+        row_count = 0
+        for chunk in itertools.chain([first_chunk], chunks):
+            for col in numeric_cols:
+                chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+            basic_parts.append(self.extract_score_and_count(chunk, sheet_name, score_cols=score_cols))
+            club_parts.append(self.transform_club_activities(chunk, sheet_name, activity_cols=activity_cols))
+            row_count += len(chunk)
+
+        club_details = pd.concat(club_parts, ignore_index=True)
+        logger.info("%s 串流處理完成：%d 筆資料", sheet_name, row_count)
+        return {
+            'basic': pd.concat(basic_parts, ignore_index=True),
+            'club': club_details,
+            'club_stats': summarize_club_details(club_details),
+        }
+
+    def stream_period_sheets(self):
+        """以串流模式處理所有期間工作表（不載入完整工作表）"""
+        results = {}
+        for sheet_name in self.discover_period_sheets():
+            result = self._stream_period_sheet(sheet_name)
+            if result is not None:
+                results[sheet_name] = result
+
+        self.sheet_results = results
+        self.club_details = pd.concat([result['club'] for result in results.values()], ignore_index=True)
+        logger.info("社團活動明細表建立完成：%d 筆資料", len(self.club_details))
+        return self.sheet_results
+
+    def build_club_details(self):
+        """由已載入的各期間資料建立社團活動明細表"""
+        self.process_period_sheets()
+        return self.club_details
+
     def build_participant_activity_stats(self):
         """建立參加者活動統計表
 
@@ -225,27 +768,34 @@ class NewDataProcessor:
         1. 各期間的運動、飲食、Bonus統計
         2. 社團活動統計（從明細表計算）
         """
-        if not self.period_data:
-            print("錯誤：請先載入期間資料")
+        sheet_names = self._period_names()
+        if not sheet_names:
+            logger.error("請先載入期間資料")
             return None
 
         # Step 1: 合併各期間的基本活動統計
         all_basic_stats = []
 
-        for sheet_name, df in self.period_data.items():
-            period_stats = self.extract_score_and_count(df, sheet_name)
+        for sheet_name in sheet_names:
+            result = self.sheet_results.get(sheet_name)
+            if result is not None:
+                period_stats = result['basic']
+            else:
+                period_stats = self.extract_score_and_count(self.period_data[sheet_name], sheet_name)
             all_basic_stats.append(period_stats)
 
         basic_stats_df = pd.concat(all_basic_stats, ignore_index=True)
 
         # Step 2: 計算社團活動統計
         if self.club_details is not None and not self.club_details.empty:
-            # 按姓名和回合期間分組計算社團活動
-            club_stats = self.club_details.groupby(['id', '姓名', '回合期間']).agg({
-                '得分': 'sum',
-                '參加社團': 'count'
-            }).reset_index()
-            club_stats.columns = ['id', '姓名', '回合期間', '參加社團得分', '參加社團次數']
+            # 按姓名和回合期間分組計算社團活動（已逐表彙總過則直接合併）
+            if all(sheet_name in self.sheet_results for sheet_name in sheet_names):
+                club_stats = pd.concat(
+                    [self.sheet_results[sheet_name]['club_stats'] for sheet_name in sheet_names],
+                    ignore_index=True
+                )
+            else:
+                club_stats = summarize_club_details(self.club_details)
 
             # Step 3: 合併基本統計和社團統計
             participant_stats = pd.merge(
@@ -263,19 +813,24 @@ class NewDataProcessor:
         # 填充缺失值
         participant_stats = participant_stats.fillna(0)
 
-        # 從帳號整理取得性別和部門資訊
+        # 從帳號整理取得性別和部門資訊（以帳號為索引一次對應）
         if self.account_info is not None:
-            for idx, row in participant_stats.iterrows():
-                participant_id = row['id']
-                if participant_id in self.account_info.index:
-                    # 取得性別（移除"生理"字樣）
-                    gender = self.account_info.loc[participant_id, '性別'] if '性別' in self.account_info.columns else ''
-                    gender = gender.replace('生理', '') if pd.notna(gender) else ''
-                    participant_stats.at[idx, '性別'] = gender
-
-                    # 取得部門
-                    dept = self.account_info.loc[participant_id, '所屬部門'] if '所屬部門' in self.account_info.columns else ''
-                    participant_stats.at[idx, '所屬部門'] = dept
+            account_info = self.account_info[~self.account_info.index.duplicated(keep='first')]
+
+            # 取得性別（移除"生理"字樣）
+            if '性別' in account_info.columns:
+                gender = account_info['性別'].fillna('').astype(str).str.replace('生理', '', regex=False)
+            else:
+                gender = pd.Series('', index=account_info.index)
+
+            # 取得部門
+            if '所屬部門' in account_info.columns:
+                dept = account_info['所屬部門']
+            else:
+                dept = pd.Series('', index=account_info.index)
+
+            participant_stats['性別'] = participant_stats['id'].map(gender)
+            participant_stats['所屬部門'] = participant_stats['id'].map(dept)
 
         # 過濾掉無效資料（id為0或姓名為0的記錄）
         participant_stats = participant_stats[
@@ -286,13 +841,59 @@ class NewDataProcessor:
         ]
 
         self.participant_stats = participant_stats
-        print(f"參加者活動統計表建立完成：{len(participant_stats)} 筆資料")
+        logger.info("參加者活動統計表建立完成：%d 筆資料", len(participant_stats))
         return participant_stats
 
+    def build_dashboard_table(self):
+        """按姓名彙總為儀表板格式
+
+        一次 groupby 加總各項分數與次數，並以 pivot_table 展開各回合期間的分數，
+        每個出現的期間各產生一個「期間k分數」欄位（k 依工作簿中的期間順序）。
+        """
+        stats = self.participant_stats.copy()
+        for col in ['性別', '所屬部門']:
+            if col not in stats.columns:
+                stats[col] = ''
+
+        score_cols = ['日常運動得分', '飲食得分', '個人Bonus得分', '參加社團得分']
+        total_cols = {
+            '日常運動得分': '運動總得分',
+            '日常運動次數': '運動總次數',
+            '飲食得分': '飲食總得分',
+            '飲食次數': '飲食總次數',
+            '個人Bonus得分': 'Bonus總得分',
+            '個人Bonus次數': 'Bonus總次數',
+            '參加社團得分': '社團總得分',
+            '參加社團次數': '社團總次數',
+        }
+
+        # 基本資訊（取第一筆）
+        info = stats.drop_duplicates('姓名', keep='first').set_index('姓名')[['id', '性別', '所屬部門']]
+
+        # 計算總分與總次數
+        totals = stats.groupby('姓名')[list(total_cols)].sum().rename(columns=total_cols)
+        totals['total'] = totals[['運動總得分', '飲食總得分', 'Bonus總得分', '社團總得分']].sum(axis=1)
+
+        # 各期間分數
+        periods = self._period_names()
+        periods += [p for p in stats['回合期間'].unique() if p not in periods]
+        stats['期間總分'] = stats[score_cols].sum(axis=1)
+        period_scores = stats.pivot_table(
+            index='姓名', columns='回合期間', values='期間總分', aggfunc='sum'
+        ).reindex(columns=periods)
+        period_scores.columns = [period_score_column(k) for k in range(1, len(periods) + 1)]
+
+        final_df = totals.join(info).join(period_scores).reset_index()
+        final_df = final_df[['id', '姓名', '性別', '所屬部門'] + list(total_cols.values()) +
+                            ['total'] + list(period_scores.columns)]
+
+        # 填充缺失的期間分數
+        return final_df.fillna(0)
+
     def save_participant_stats(self, output_path='data/參加者活動統計表.xlsx'):
         """儲存參加者活動統計表"""
         if self.participant_stats is None:
-            print("錯誤：請先建立參加者活動統計表")
+            logger.error("請先建立參加者活動統計表")
             return False
 
         try:
@@ -305,101 +906,50 @@ class NewDataProcessor:
             else:
                 full_path = output_path
 
-            # 按姓名彙總為儀表板格式
-            dashboard_data = []
-
-            for name, group in self.participant_stats.groupby('姓名'):
-                # 基本資訊（取第一筆）
-                first_row = group.iloc[0]
-
-                # 計算總分與總次數
-                row_data = {
-                    'id': first_row['id'],
-                    '姓名': name,
-                    '性別': first_row.get('性別', ''),
-                    '所屬部門': first_row.get('所屬部門', ''),
-                    '運動總得分': group['日常運動得分'].sum(),
-                    '運動總次數': group['日常運動次數'].sum(),
-                    '飲食總得分': group['飲食得分'].sum(),
-                    '飲食總次數': group['飲食次數'].sum(),
-                    'Bonus總得分': group['個人Bonus得分'].sum(),
-                    'Bonus總次數': group['個人Bonus次數'].sum(),
-                    '社團總得分': group['參加社團得分'].sum(),
-                    '社團總次數': group['參加社團次數'].sum()
-                }
-
-                # 計算total
-                row_data['total'] = (row_data['運動總得分'] + row_data['飲食總得分'] +
-                                    row_data['Bonus總得分'] + row_data['社團總得分'])
-
-                # 各期間分數
-                for _, period_row in group.iterrows():
-                    period = period_row['回合期間']
-                    period_total = (period_row['日常運動得分'] + period_row['飲食得分'] +
-                                   period_row['個人Bonus得分'] + period_row['參加社團得分'])
-
-                    if period == '0808-0830':
-                        row_data['期間1分數'] = period_total
-                    elif period == '0831-0921':
-                        row_data['期間2分數'] = period_total
-
-                dashboard_data.append(row_data)
-
-            # 轉為DataFrame
-            final_df = pd.DataFrame(dashboard_data)
-
-            # 填充缺失的期間分數
-            if '期間1分數' not in final_df.columns:
-                final_df['期間1分數'] = 0
-            if '期間2分數' not in final_df.columns:
-                final_df['期間2分數'] = 0
-
-            final_df = final_df.fillna(0)
+            final_df = self.build_dashboard_table()
 
             # 儲存
             final_df.to_excel(full_path, index=False)
-            print(f"參加者活動統計表已儲存至：{full_path}")
+            logger.info("參加者活動統計表已儲存至：%s", full_path)
             return True
 
         except Exception as e:
-            print(f"儲存失敗：{str(e)}")
+            logger.warning("儲存失敗：%s", e)
             import traceback
             traceback.print_exc()
             return False
 
     def process_all(self):
         """執行完整的資料處理流程"""
-        print("=== 開始處理資料 ===")
+        logger.info("=== 開始處理資料 ===")
 
         # 1. 載入帳號整理
-        print("\n1. 載入帳號整理...")
+        logger.info("1. 載入帳號整理...")
         self.load_account_info()
 
         # 2. 載入各期間資料
-        print("\n2. 載入期間資料...")
-        self.load_period_data('0808-0830')
-        self.load_period_data('0831-0921')
-
-        # 3. 處理社團活動明細
-        print("\n3. 處理社團活動明細...")
-        all_club_details = []
-
-        for sheet_name, df in self.period_data.items():
-            club_df = self.transform_club_activities(df, sheet_name)
-            all_club_details.append(club_df)
+        logger.info("2. 載入期間資料...")
+        if self.streaming:
+            # 串流模式：逐批讀取並直接處理，不保留完整的期間工作表
+            logger.info("（串流模式）")
+            logger.info("3. 處理社團活動明細...")
+            self.stream_period_sheets()
+        else:
+            self.load_all_periods()
 
-        self.club_details = pd.concat(all_club_details, ignore_index=True)
-        print(f"社團活動明細表建立完成：{len(self.club_details)} 筆資料")
+            # 3. 處理各期間工作表（分數次數、社團活動明細）
+            logger.info("3. 處理社團活動明細...")
+            self.process_period_sheets()
 
         # 4. 建立參加者活動統計表
-        print("\n4. 建立參加者活動統計表...")
+        logger.info("4. 建立參加者活動統計表...")
         self.build_participant_activity_stats()
 
         # 5. 儲存結果
-        print("\n5. 儲存參加者活動統計表...")
+        logger.info("5. 儲存參加者活動統計表...")
         self.save_participant_stats()
 
-        print("\n=== 資料處理完成 ===")
+        logger.info("=== 資料處理完成 ===")
 
         return self.participant_stats
 
@@ -410,31 +960,31 @@ class NewDataProcessor:
     def validate_participant_score(self, name):
         """驗證參加者分數"""
         if self.participant_stats is None:
-            print("錯誤：請先建立參加者活動統計表")
+            logger.error("請先建立參加者活動統計表")
             return
 
         person_data = self.participant_stats[self.participant_stats['姓名'] == name]
 
         if person_data.empty:
-            print(f"找不到 {name} 的資料")
+            logger.warning("找不到 %s 的資料", name)
             return
 
-        print(f"\n=== {name} 的分數驗證 ===")
+        logger.info("=== %s 的分數驗證 ===", name)
 
         for _, row in person_data.iterrows():
             period = row['回合期間']
             total = row['日常運動得分'] + row['飲食得分'] + row['個人Bonus得分'] + row['參加社團得分']
 
-            print(f"\n期間：{period}")
-            print(f"  日常運動：{row['日常運動得分']}分 ({row['日常運動次數']}次)")
-            print(f"  飲食：{row['飲食得分']}分 ({row['飲食次數']}次)")
-            print(f"  Bonus：{row['個人Bonus得分']}分 ({row['個人Bonus次數']}次)")
-            print(f"  社團活動：{row['參加社團得分']}分 ({row['參加社團次數']}次)")
-            print(f"  期間總分：{total}分")
+            logger.info("期間：%s", period)
+            logger.info("  日常運動：%s分 (%s次)", row['日常運動得分'], row['日常運動次數'])
+            logger.info("  飲食：%s分 (%s次)", row['飲食得分'], row['飲食次數'])
+            logger.info("  Bonus：%s分 (%s次)", row['個人Bonus得分'], row['個人Bonus次數'])
+            logger.info("  社團活動：%s分 (%s次)", row['參加社團得分'], row['參加社團次數'])
+            logger.info("  期間總分：%s分", total)
 
         overall_total = person_data['日常運動得分'].sum() + person_data['飲食得分'].sum() + \
                        person_data['個人Bonus得分'].sum() + person_data['參加社團得分'].sum()
-        print(f"\n整體總分：{overall_total}分")
+        logger.info("整體總分：%s分", overall_total)
 
 
 if __name__ == "__main__":
@@ -445,5 +995,4 @@ if __name__ == "__main__":
     processor.process_all()
 
     # 驗證莊依靜的分數
-    print("\n" + "="*50)
     processor.validate_participant_score('莊依靜')
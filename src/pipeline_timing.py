@@ -0,0 +1,179 @@
+"""
+資料處理流程計時
+記錄每個處理階段（載入、清理、統計、活動分析、排名）的耗時、輸入輸出筆數與是否命中快取，
+以結構化的 log 紀錄輸出，並保留最近幾次執行的結果供儀表板的管理面板顯示
+"""
+
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+# 保留的最近執行次數
+MAX_RUNS = 20
+
+logger = logging.getLogger('healthmaster.pipeline')
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(asctime)s [%(name)s] %(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_runs = deque(maxlen=MAX_RUNS)
+_runs_lock = threading.Lock()
+_local = threading.local()
+
+
+class Span:
+    """單一處理階段的計時紀錄"""
+
+    __slots__ = ('stage', 'started_at', 'duration_ms', 'rows_in', 'rows_out', 'cache_hit')
+
+    def __init__(self, stage, rows_in=None):
+        self.stage = stage
+        self.started_at = datetime.now()
+        self.duration_ms = None
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.cache_hit = None
+
+    def as_record(self):
+        return {
+            '階段': self.stage,
+            '開始時間': self.started_at,
+            '耗時(ms)': self.duration_ms,
+            '輸入筆數': self.rows_in,
+            '輸出筆數': self.rows_out,
+            '命中快取': self.cache_hit,
+        }
+
+
+def begin_run(label):
+    """開始一次新的執行（例如一次 Streamlit 重新執行），之後的階段都歸入這次執行"""
+    run = {'label': label, 'started_at': datetime.now(), 'spans': []}
+    _local.run = run
+    with _runs_lock:
+        _runs.append(run)
+    return run
+
+
+def _current_run():
+    run = getattr(_local, 'run', None)
+    if run is None:
+        run = begin_run(threading.current_thread().name)
+    return run
+
+
+def current_span():
+    """目前執行中的階段（不在任何階段內時為 None）"""
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+
+def mark_cache_hit(hit):
+    """標記目前階段是否命中快取"""
+    span = current_span()
+    if span is not None:
+        span.cache_hit = hit
+
+
+def count_rows(value):
+    """計算 DataFrame（或 DataFrame 組成的 tuple/list）的筆數，無法計算時回傳 None"""
+    if isinstance(value, (tuple, list)):
+        counts = [count_rows(item) for item in value]
+        counts = [count for count in counts if count is not None]
+        return sum(counts) if counts else None
+    if hasattr(value, 'shape') and hasattr(value, 'columns'):
+        return len(value)
+    return None
+
+
+class stage:
+    """計時區塊
+
+    用法：
+        with stage('載入資料', rows_in=len(df)) as span:
+            ...
+            span.rows_out = len(result)
+    """
+
+    def __init__(self, name, rows_in=None):
+        self.span = Span(name, rows_in)
+
+    def __enter__(self):
+        if not hasattr(_local, 'stack'):
+            _local.stack = []
+        _local.stack.append(self.span)
+        self._start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self.span
+        span.duration_ms = (time.perf_counter() - self._start) * 1000
+        _local.stack.pop()
+        _current_run()['spans'].append(span)
+
+        logger.info(
+            "stage=%s duration_ms=%.1f rows_in=%s rows_out=%s cache_hit=%s%s",
+            span.stage, span.duration_ms, span.rows_in, span.rows_out, span.cache_hit,
+            f" error={exc_type.__name__}" if exc_type else '',
+            extra={'pipeline_span': span.as_record()},
+        )
+        return False
+
+
+def timed_stage(name, rows_in=None):
+    """將方法包裝為計時階段
+
+    輸入筆數預設取自第一個 DataFrame 參數（或由 rows_in(*args, **kwargs) 計算），
+    輸出筆數取自回傳值。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if rows_in is not None:
+                count_in = rows_in(*args, **kwargs)
+            else:
+                count_in = next(
+                    (count for count in map(count_rows, list(args[1:]) + list(kwargs.values())) if count is not None),
+                    None,
+                )
+            with stage(name, count_in) as span:
+                result = func(*args, **kwargs)
+                span.rows_out = count_rows(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def recent_runs(limit=MAX_RUNS):
+    """最近幾次執行的各階段紀錄（新到舊）
+
+    Returns:
+        list: [{'label', 'started_at', 'spans': [紀錄 dict, ...]}, ...]
+    """
+    with _runs_lock:
+        runs = list(_runs)[-limit:]
+    return [
+        {
+            'label': run['label'],
+            'started_at': run['started_at'],
+            'spans': [span.as_record() for span in list(run['spans'])],
+        }
+        for run in reversed(runs)
+    ]
+
+
+def recent_runs_frame(limit=MAX_RUNS):
+    """最近幾次執行的各階段紀錄（DataFrame，每個階段一列）"""
+    import pandas as pd
+
+    rows = []
+    for index, run in enumerate(recent_runs(limit), start=1):
+        for record in run['spans']:
+            rows.append({'執行': index, '執行時間': run['started_at'], **record})
+    return pd.DataFrame(rows)
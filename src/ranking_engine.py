@@ -1,128 +1,683 @@
 """
 排名計算引擎
-處理男女分組排名與獎金計算
+依分組欄位（性別、部門等）計算組內排名與獎金，獎金結構與分組方式由 config/prize_ladders.json 設定
 """
 
+import json
+import os
+import re
+import threading
+
+import numpy as np
 import pandas as pd
-import streamlit as st
+
+from pipeline_timing import timed_stage
+
+
+# 獎金結構與分組設定檔
+PRIZE_CONFIG_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'prize_ladders.json'
+)
 
 
 class RankingEngine:
     """排名計算引擎"""
     
-    # 男子組獎金結構
-    MALE_PRIZE_CONFIG = {
-        1: ('NT$6,000', '🥇', '#FFD700'),      # 金色
-        2: ('NT$3,000', '🥈', '#C0C0C0'),      # 銀色
-        3: ('NT$3,000', '🥈', '#C0C0C0'),
-        4: ('NT$3,000', '🥈', '#C0C0C0'),
-        5: ('NT$2,000', '🥉', '#CD7F32'),      # 銅色
-        6: ('NT$2,000', '🥉', '#CD7F32'),
-        7: ('NT$2,000', '🥉', '#CD7F32'),
-        8: ('NT$2,000', '🥉', '#CD7F32'),
-        9: ('NT$2,000', '🥉', '#CD7F32'),
-        10: ('NT$1,000', '🏅', '#50C878'),     # 綠色
-        11: ('NT$1,000', '🏅', '#50C878'),
-        12: ('NT$1,000', '🏅', '#50C878'),
-        13: ('NT$1,000', '🏅', '#50C878'),
-        14: ('NT$1,000', '🏅', '#50C878'),
-    }
+    # 未獲獎（名次超出獎金結構或總分未達門檻）
+    NO_PRIZE = ('-', '', '#FFFFFF')
+    
+    # 獲得獎金的最低總分
+    PRIZE_MIN_SCORE = 200
     
-    # 女子組獎金結構（新增）
-    FEMALE_PRIZE_CONFIG = {
-        1: ('NT$6,000', '🥇', '#FFD700'),      # 第1-2名
-        2: ('NT$6,000', '🥇', '#FFD700'),
-        3: ('NT$3,000', '🥈', '#C0C0C0'),      # 第3-8名
-        4: ('NT$3,000', '🥈', '#C0C0C0'),
-        5: ('NT$3,000', '🥈', '#C0C0C0'),
-        6: ('NT$3,000', '🥈', '#C0C0C0'),
-        7: ('NT$3,000', '🥈', '#C0C0C0'),
-        8: ('NT$3,000', '🥈', '#C0C0C0'),
-        9: ('NT$2,000', '🥉', '#CD7F32'),      # 第9-18名
-        10: ('NT$2,000', '🥉', '#CD7F32'),
-        11: ('NT$2,000', '🥉', '#CD7F32'),
-        12: ('NT$2,000', '🥉', '#CD7F32'),
-        13: ('NT$2,000', '🥉', '#CD7F32'),
-        14: ('NT$2,000', '🥉', '#CD7F32'),
-        15: ('NT$2,000', '🥉', '#CD7F32'),
-        16: ('NT$2,000', '🥉', '#CD7F32'),
-        17: ('NT$2,000', '🥉', '#CD7F32'),
-        18: ('NT$2,000', '🥉', '#CD7F32'),
-        19: ('NT$1,000', '🏅', '#50C878'),     # 第19-28名
-        20: ('NT$1,000', '🏅', '#50C878'),
-        21: ('NT$1,000', '🏅', '#50C878'),
-        22: ('NT$1,000', '🏅', '#50C878'),
-        23: ('NT$1,000', '🏅', '#50C878'),
-        24: ('NT$1,000', '🏅', '#50C878'),
-        25: ('NT$1,000', '🏅', '#50C878'),
-        26: ('NT$1,000', '🏅', '#50C878'),
-        27: ('NT$1,000', '🏅', '#50C878'),
-        28: ('NT$1,000', '🏅', '#50C878'),
+    # 試算時每一筆活動紀錄的得分（社團活動直接輸入分數）
+    ACTIVITY_POINTS = {
+        'exercise': 10,  # 日常運動
+        'diet': 10,      # 健康飲食
+        'bonus': 30,     # 額外加分
     }
     
-    def __init__(self, df):
+    # 儀表板使用的分組方式（設定檔 leagues 中的名稱）
+    DEFAULT_LEAGUE = 'gender'
+    
+    # 同分名次規則
+    #   ordinal：同分者依排序先後給不同名次（預設，與過去的名次相同）
+    #   min：同分者同名次，下一名跳號（1, 2, 2, 4），亦可寫作 competition
+    #   dense：同分者同名次，下一名不跳號（1, 2, 2, 3）
+    #   earliest：同分時較早期間達到該總分者在前，仍相同者同名次（跳號）
+    #   category：同分時依設定的分項得分由高到低比較，仍相同者同名次（跳號）
+    TIE_POLICIES = ('ordinal', 'min', 'dense', 'earliest', 'category')
+    TIE_POLICY_ALIASES = {'competition': 'min'}
+    DEFAULT_TIE_POLICY = 'ordinal'
+    
+    # 各期間分數欄位（earliest 規則依此計算累積分數）
+    PERIOD_COLUMN_PATTERN = re.compile(r'^total_期間(\d+)$')
+    
+    # 設定檔內容與依名次索引的獎金表（獎金結構名稱 → 陣列），第一次使用時載入
+    _prize_config = None
+    _prize_tables = {}
+    
+    def __init__(self, df, league=DEFAULT_LEAGUE, tie_policy=None):
         self.df = df
+        self.league = league
+        self.tie_policy = self.resolve_tie_policy(tie_policy)
+        self.groups = {}  # 組別名稱 → 排名資料表
+        self.group_ladders = {}  # 組別名稱 → 獎金結構名稱（不設獎金時為 None）
         self.female_df = None
         self.male_df = None
+        self.sorted_names = []  # 排序後的姓名列表（個人查詢選單使用）
+        self._person_index = {}  # 姓名 → (組別, 位置)
+        self._sorted_scores = {}  # 組別 → 由低到高排序的總分陣列（試算名次使用）
+        self._update_lock = threading.Lock()  # 單筆分數更新依序套用
     
-    def calculate_rankings(self):
-        """計算男女分組排名"""
-        # 女性組
-        female_data = self.df[self.df['性別'] == '女'].copy()
-        female_data = female_data.sort_values('total', ascending=False).reset_index(drop=True)
-        female_data['排名'] = range(1, len(female_data) + 1)
-        
-        # 添加獎金資訊（使用女性組配置，加入分數條件）
-        female_data[['獎金', '獎牌', '顏色']] = female_data.apply(
-            lambda row: pd.Series(self.get_prize_info(row['排名'], 'female', row['total'])), axis=1
-        )
+    @classmethod
+    def prize_config(cls):
+        """讀取獎金結構與分組設定（只讀取一次）"""
+        if cls._prize_config is None:
+            with open(PRIZE_CONFIG_PATH, encoding='utf-8') as f:
+                cls._prize_config = json.load(f)
+        return cls._prize_config
+    
+    @classmethod
+    def resolve_tie_policy(cls, tie_policy=None):
+        """取得同分名次規則（未指定時使用設定檔的 tie_policy）"""
+        if tie_policy is None:
+            tie_policy = cls.prize_config().get('tie_policy', cls.DEFAULT_TIE_POLICY)
+        tie_policy = cls.TIE_POLICY_ALIASES.get(tie_policy, tie_policy)
+        if tie_policy not in cls.TIE_POLICIES:
+            raise ValueError(f"未知的同分名次規則：{tie_policy}（可用：{', '.join(cls.TIE_POLICIES)}）")
+        return tie_policy
+    
+    @classmethod
+    def league_groups(cls, df, league=DEFAULT_LEAGUE):
+        """取得分組方式的分組欄位與各組設定
+
+        設定檔未列出組別時，分組欄位的每個值各為一組，組別名稱即為欄位值。
+
+        Returns:
+            tuple: (分組欄位, [(欄位值, 組別名稱, 獎金結構名稱), ...])
+        """
+        config = cls.prize_config()['leagues'][league]
+        group_by = config['group_by']
+        if 'groups' in config:
+            groups = [
+                (group['value'], group.get('label', group['value']), group.get('ladder'))
+                for group in config['groups']
+            ]
+        else:
+            values = sorted(df[group_by].dropna().unique())
+            groups = [(value, str(value), config.get('ladder')) for value in values]
+        return group_by, groups
+    
+    def tie_break_keys(self, df):
+        """同分時比較的排序鍵（數值越小越前面，依優先順序排列）
+
+        Returns:
+            list: 與 df 各列對應的 ndarray；ordinal、min、dense 規則不需排序鍵，回傳空 list
+        """
+        if self.tie_policy == 'earliest':
+            period_cols = sorted(
+                (col for col in df.columns if isinstance(col, str) and self.PERIOD_COLUMN_PATTERN.match(col)),
+                key=lambda col: int(self.PERIOD_COLUMN_PATTERN.match(col).group(1)),
+            )
+            if not period_cols:
+                return []
+            # 累積分數第一次達到總分的期間（都未達到時排在最後）
+            cumulative = np.cumsum(df[period_cols].to_numpy(dtype=float), axis=1)
+            reached = cumulative >= df['total'].to_numpy(dtype=float)[:, None]
+            return [np.where(reached.any(axis=1), reached.argmax(axis=1), len(period_cols))]
         
-        self.female_df = female_data
+        if self.tie_policy == 'category':
+            columns = self.prize_config().get('tie_break_columns', [])
+            return [-df[col].to_numpy(dtype=float) for col in columns if col in df.columns]
         
-        # 男性組
-        male_data = self.df[self.df['性別'] == '男'].copy()
-        male_data = male_data.sort_values('total', ascending=False).reset_index(drop=True)
-        male_data['排名'] = range(1, len(male_data) + 1)
+        return []
+    
+    def rank_league(self, league=DEFAULT_LEAGUE):
+        """一次計算分組方式下所有組別的組內排名、獎金與分數差距
+
+        Returns:
+            dict: 組別名稱 → 排名資料表（依名次排列）
+        """
+        group_by, groups = self.league_groups(self.df, league)
+        indices = self.df.groupby(group_by, observed=True, sort=False).indices
+        return self._rank_groups(self.df, [
+            (label, ladder, indices.get(value, np.empty(0, dtype=np.intp)))
+            for value, label, ladder in groups
+        ])
+    
+    @staticmethod
+    def _group_order(totals, positions):
+        """單一組別依總分由高到低排列的列位置（同分先後與 DataFrame.sort_values 逐組排序相同）
+
+        Args:
+            totals: 整份資料的總分
+            positions: 該組的列位置
+        """
+        # 與 sort_values(ascending=False) 相同：反轉後排序再反轉
+        positions = positions[::-1]
+        return positions[totals[positions].argsort(kind='quicksort')][::-1]
+    
+    def _rank_groups(self, df, groups):
+        """依同分名次規則計算各組的組內排名、獎金與分數差距
+
+        min、dense、earliest、category 規則以一次 lexsort 依組別、總分（由高到低）與排序鍵排列所有組別
+        （穩定排序，同名次者維持原本的先後）；ordinal 規則的名次由同分先後決定，
+        需維持與過去 DataFrame.sort_values 逐組排序相同的先後，改為逐組排序總分陣列。
+        整份資料依組別與名次重新排列一次，名次由相鄰資料列的分數（與排序鍵）是否相同一次算出，
+        再切出各組的排名資料表。
+
+        Args:
+            df: 原始資料
+            groups: [(組別名稱, 獎金結構名稱, 該組在 df 中的列位置), ...]
+
+        Returns:
+            dict: 組別名稱 → 排名資料表（依名次排列）
+        """
+        totals = df['total'].to_numpy()
+        keys = self.tie_break_keys(df)
         
-        # 添加獎金資訊（使用男性組配置，加入分數條件）
-        male_data[['獎金', '獎牌', '顏色']] = male_data.apply(
-            lambda row: pd.Series(self.get_prize_info(row['排名'], 'male', row['total'])), axis=1
-        )
+        sizes = [len(positions) for _, _, positions in groups]
+        ends = np.cumsum(sizes, dtype=np.intp)
+        bounds = [
+            (label, ladder, int(end) - size, int(end))
+            for (label, ladder, _), size, end in zip(groups, sizes, ends)
+        ]
         
-        self.male_df = male_data
+        if not groups:
+            order = np.empty(0, dtype=np.intp)
+        elif self.tie_policy == 'ordinal':
+            order = np.concatenate([self._group_order(totals, positions) for _, _, positions in groups])
+        else:
+            # lexsort 以最後一個鍵為主要排序鍵：組別，總分由高到低，再依排序鍵由小到大
+            positions = np.concatenate([positions for _, _, positions in groups])
+            group_codes = np.repeat(np.arange(len(groups)), sizes)
+            sort_keys = [key[positions] for key in reversed(keys)] + [-totals[positions], group_codes]
+            order = positions[np.lexsort(sort_keys)]
+        
+        ranked = df.take(order).reset_index(drop=True)
+        ranked_totals = totals[order]
+        
+        # 每一列所屬組別的起始位置
+        count = len(ranked)
+        group_starts = np.repeat(ends - np.asarray(sizes, dtype=np.intp), sizes)
+        row_numbers = np.arange(count)
+        
+        # 與前一列分數（與排序鍵）不同、或為組內第一列時，開始新的同名次區塊
+        if self.tie_policy == 'ordinal':
+            new_block = np.ones(count, dtype=bool)
+        else:
+            new_block = row_numbers == group_starts
+            new_block[1:] |= ranked_totals[1:] != ranked_totals[:-1]
+            for key in keys:
+                ranked_key = key[order]
+                new_block[1:] |= ranked_key[1:] != ranked_key[:-1]
+        
+        if self.tie_policy == 'dense':
+            block_numbers = np.cumsum(new_block)
+            ranks = block_numbers - block_numbers[group_starts] + 1
+        else:
+            block_starts = np.maximum.accumulate(np.where(new_block, row_numbers, 0))
+            ranks = block_starts - group_starts + 1
+        ranked['排名'] = ranks
+        
+        prizes = np.empty((count, 3), dtype=object)
+        gaps = {}
+        for label, ladder, start, end in bounds:
+            group_totals = ranked_totals[start:end]
+            group_ranks = ranks[start:end]
+            # dense 規則的第 n 名分數為第 n 個不同的總分，其他規則為第 n 位的總分
+            rank_scores = group_totals[new_block[start:end]] if self.tie_policy == 'dense' else None
+            prizes[start:end] = self._prize_values(group_ranks, group_totals, ladder)
+            group_gaps = self._gap_values(group_totals, np.arange(end - start), ladder, group_ranks, rank_scores)
+            for col, values in group_gaps.items():
+                gaps.setdefault(col, []).append(values)
+        
+        ranked['獎金'] = prizes[:, 0]
+        ranked['獎牌'] = prizes[:, 1]
+        ranked['顏色'] = prizes[:, 2]
+        for col, values in gaps.items():
+            ranked[col] = np.concatenate(values)
+        
+        return {
+            label: ranked.iloc[start:end].reset_index(drop=True)
+            for label, _, start, end in bounds
+        }
+    
+    @timed_stage('計算排名', rows_in=lambda self: len(self.df))
+    def calculate_rankings(self):
+        """計算各組排名（預設為男女分組）"""
+        _, groups = self.league_groups(self.df, self.league)
+        self.group_ladders = {label: ladder for _, label, ladder in groups}
+        self._set_groups(self.rank_league(self.league))
         
         return self.female_df, self.male_df
     
-    @staticmethod
-    def get_prize_info(rank, gender='male', total_score=0):
-        """根據排名、性別和總分獲取獎金資訊"""
-        # 新增條件：總分必須大於等於200分才能獲得獎金
-        if total_score < 200:
-            return ('-', '', '#FFFFFF')
+    def _set_groups(self, groups):
+        """更新各組排名資料表與查詢索引"""
+        self.groups = groups
+        self.female_df = self.groups.get('女性組')
+        self.male_df = self.groups.get('男性組')
+        
+        self._build_person_index()
+    
+    def _build_person_index(self):
+        """建立姓名到組別、位置的索引及排序後的姓名列表
+
+        同名時以設定檔中排在前面的組別（例如女性組）、名次較前者為準（與逐組查找的結果相同）。
+        """
+        index = {}
+        for group, group_df in reversed(list(self.groups.items())):
+            if group_df is None or '姓名' not in group_df.columns:
+                continue
+            positions = range(len(group_df) - 1, -1, -1)
+            index.update(zip(group_df['姓名'].to_numpy()[::-1], ((group, position) for position in positions)))
+        self._person_index = index
+        
+        names = [
+            group_df['姓名'] for group_df in self.groups.values()
+            if group_df is not None and '姓名' in group_df.columns
+        ]
+        self.sorted_names = sorted(pd.concat(names).unique().tolist()) if names else []
+        
+        # 各組總分已依名次由高到低排列，反轉即為由低到高的排序陣列
+        self._sorted_scores = {
+            group: group_df['total'].to_numpy()[::-1].copy()
+            for group, group_df in self.groups.items()
+            if group_df is not None
+        }
+    
+    def locate_person(self, key):
+        """查詢姓名所在的組別與位置，找不到時回傳 None"""
+        return self._person_index.get(key)
+    
+    @classmethod
+    def get_prize_table(cls, ladder='male'):
+        """取得依名次索引的獎金表（第 0 列為未獲獎）
+
+        Args:
+            ladder: 設定檔中的獎金結構名稱，None 表示不設獎金
+
+        Returns:
+            ndarray: shape 為 (最大獲獎名次 + 1, 3)，每列為 (獎金, 獎牌, 顏色)
+        """
+        table = cls._prize_tables.get(ladder)
+        if table is None:
+            tiers = cls.prize_config()['ladders'][ladder] if ladder is not None else []
+            max_rank = max((tier['ranks'][1] for tier in tiers), default=0)
+            table = np.empty((max_rank + 1, 3), dtype=object)
+            for rank in range(len(table)):
+                table[rank] = cls.NO_PRIZE
+            for tier in tiers:
+                first, last = tier['ranks']
+                for rank in range(first, last + 1):
+                    table[rank] = (tier['prize'], tier['medal'], tier['color'])
+            cls._prize_tables[ladder] = table
+        return table
+    
+    def max_prize_rank(self, group):
+        """組別的最後一個獲獎名次（不設獎金的組別為 0）"""
+        return len(self.get_prize_table(self.group_ladders.get(group))) - 1
+    
+    @classmethod
+    def _prize_values(cls, ranks, totals, ladder):
+        """依名次與總分取得 (獎金, 獎牌, 顏色)，回傳 shape 為 (筆數, 3) 的陣列"""
+        table = cls.get_prize_table(ladder)
+        
+        # 名次超出獎金結構或總分未達門檻時對應到第 0 列（未獲獎）
+        index = np.where(ranks < len(table), ranks, 0)
+        index[totals < cls.PRIZE_MIN_SCORE] = 0
+        return np.take(table, index, axis=0)
+    
+    @classmethod
+    def get_next_tier_cutoffs(cls, ladder='male'):
+        """每個名次要晉升到下一個獎級時需達到的名次（0 表示已在最高獎級）
+
+        Returns:
+            ndarray: 長度為 最大獲獎名次 + 2，索引為名次（最後一格代表所有獎金線外的名次）
+        """
+        prizes = cls.get_prize_table(ladder)[1:, 0]
+        max_rank = len(prizes)
+        cutoffs = np.zeros(max_rank + 2, dtype=np.int64)
+        if max_rank == 0:
+            return cutoffs
+        
+        # 每個獎級的最後一個名次
+        tier_ids = np.concatenate(([0], np.cumsum(prizes[1:] != prizes[:-1])))
+        tier_last_rank = np.flatnonzero(np.append(tier_ids[1:] != tier_ids[:-1], True)) + 1
+        
+        previous_tier = tier_ids - 1
+        cutoffs[1:max_rank + 1] = np.where(previous_tier >= 0, tier_last_rank[np.maximum(previous_tier, 0)], 0)
+        cutoffs[max_rank + 1] = max_rank  # 獎金線外：下一個獎級即為獎金線
+        return cutoffs
+    
+    @classmethod
+    def _gap_values(cls, totals, positions, ladder, ranks=None, rank_scores=None):
+        """計算指定位置的參賽者與前一名、下一獎級、獎金線及獎金門檻的分數差距
+
+        Args:
+            totals: 整組依名次由高到低排列的總分
+            positions: 要計算的位置
+            ranks: 這些位置的名次（省略時為位置 + 1）
+            rank_scores: 達到第 n 名所需的總分（索引 n - 1，省略時為 totals）
+        """
+        ranks = positions + 1 if ranks is None else ranks
+        rank_scores = totals if rank_scores is None else rank_scores
+        count = len(rank_scores)
+        own = totals[positions]
+        cutoffs = cls.get_next_tier_cutoffs(ladder)
+        max_prize_rank = len(cutoffs) - 2
+        
+        def gap_to_rank(target_ranks):
+            # 與指定名次的分數差距（目標名次為 0 或不存在時為 0）
+            target_ranks = np.minimum(target_ranks, count)
+            target_scores = rank_scores[np.maximum(target_ranks - 1, 0)] if count else own
+            return np.where(target_ranks > 0, np.maximum(target_scores - own, 0), 0)
+        
+        return {
+            '距前一名': gap_to_rank(ranks - 1),
+            '距下一獎級': gap_to_rank(cutoffs[np.minimum(ranks, max_prize_rank + 1)]),
+            '距獎金線': gap_to_rank(np.where(ranks > max_prize_rank, max_prize_rank, 0)),
+            '距獎金門檻': np.maximum(cls.PRIZE_MIN_SCORE - own, 0),
+        }
+    
+    @classmethod
+    def get_prize_info(cls, rank, ladder='male', total_score=0):
+        """根據排名、獎金結構和總分獲取獎金資訊"""
+        table = cls.get_prize_table(ladder)
+        # 總分必須大於等於門檻才能獲得獎金
+        if total_score < cls.PRIZE_MIN_SCORE or not 0 < rank < len(table):
+            return cls.NO_PRIZE
+        return tuple(table[rank])
+    
+    def simulate(self, name, exercise=0, diet=0, bonus=0, club_points=0):
+        """試算增加活動紀錄後的名次與獎金
+
+        Args:
+            name: 姓名
+            exercise / diet / bonus: 增加的日常運動、健康飲食、額外加分次數
+            club_points: 增加的社團活動分數
+        """
+        extra_points = (
+            exercise * self.ACTIVITY_POINTS['exercise']
+            + diet * self.ACTIVITY_POINTS['diet']
+            + bonus * self.ACTIVITY_POINTS['bonus']
+            + club_points
+        )
+        return self.simulate_score(name, extra_points)
+    
+    def simulate_score(self, name, extra_points):
+        """試算總分增加 extra_points 後的名次與獎金（二分搜尋，不重新排序）
+
+        同分時依同分名次規則決定名次（ordinal、earliest、category 規則排在原本已達到該分數的參賽者之後）。
+
+        Returns:
+            dict: 試算總分、名次、獎金、獎牌與名次變化；找不到參賽者時回傳 None
+        """
+        # 與單筆分數更新互斥，避免讀到不同版本的索引與資料表
+        with self._update_lock:
+            location = self.locate_person(name)
+            if location is None:
+                return None
             
-        if gender == 'female':
-            config = RankingEngine.FEMALE_PRIZE_CONFIG
+            group, position = location
+            group_df = self.groups[group]
+            scores = self._sorted_scores[group]
+        
+        current_total = group_df['total'].iat[position]
+        current_rank = int(group_df['排名'].iat[position])
+        new_total = current_total + extra_points
+        
+        if extra_points == 0:
+            new_rank = current_rank
         else:
-            config = RankingEngine.MALE_PRIZE_CONFIG
-            
-        if rank in config:
-            return config[rank]
+            new_rank = self._rank_for_score(scores, current_total, new_total)
+        
+        table = self.get_prize_table(self.group_ladders.get(group))
+        prize_rank = new_rank if new_rank < len(table) and new_total >= self.PRIZE_MIN_SCORE else 0
+        prize, medal, color = table[prize_rank]
+        
+        return {
+            'group': group,
+            'total': new_total,
+            'rank': new_rank,
+            'rank_change': current_rank - new_rank,
+            'prize': prize,
+            'medal': medal,
+            'color': color,
+        }
+    
+    def _rank_for_score(self, scores, current_total, new_total):
+        """總分由 current_total 變為 new_total 後的名次
+
+        Args:
+            scores: 整組由低到高排序的總分（含本人原分數）
+        """
+        if self.tie_policy in ('min', 'dense'):
+            # 同分同名次：只計算分數高於試算總分的其他參賽者（本人原分數不計入）
+            higher = scores[np.searchsorted(scores, new_total, side='right'):]
+            if self.tie_policy == 'dense':
+                ahead = np.count_nonzero(np.diff(higher)) + 1 if len(higher) else 0
+                if current_total > new_total and np.count_nonzero(higher == current_total) == 1:
+                    ahead -= 1
+            else:
+                ahead = len(higher) - (current_total > new_total)
         else:
-            return ('-', '', '#FFFFFF')
+            # 分數大於等於試算總分的其他參賽者（新增的分數最晚達到，同分時排在後面）
+            ahead = len(scores) - np.searchsorted(scores, new_total, side='left')
+            if current_total >= new_total:
+                ahead -= 1
+        return int(ahead) + 1
     
-    def get_person_info(self, name):
-        """查詢個人資訊"""
-        # 在女性組中查找
-        female_result = self.female_df[self.female_df['姓名'] == name]
-        if not female_result.empty:
-            return female_result.iloc[0], '女性組', len(self.female_df)
+    def apply_score_update(self, name, delta, category=None):
+        """套用單一參賽者的分數更正，只重新計算受影響的名次區間
+
+        以二分搜尋找出新位置（earliest、category 規則再於同分區塊內比較排序鍵），資料列以一次 take 平移。
+        名次、獎金與差距只重算原位置與新位置之間、以及與該區間相連的同名次區塊；
+        dense 規則下區間之後的名次都可能差一名，改為重算區間之後的所有列。
+        區間包含獎級分界或獎金線名次時，整組的獎級差距一併重算。排名前的原始資料（self.df）不會更新。
+
+        引擎由所有工作階段共用：更新產生新的組別資料表與排序分數陣列，完成後才替換，
+        已取得 female_df / male_df 的讀取端不會看到平移到一半的資料。
+
+        Args:
+            name: 姓名
+            delta: 總分增減
+            category: 同時增減的分項欄位（例如 '日常運動總分'），可省略
+
+        Returns:
+            dict: 組別、原名次、新名次與新總分；找不到參賽者時回傳 None
+        """
+        with self._update_lock:
+            location = self.locate_person(name)
+            if location is None:
+                return None
+            
+            group, old_position = location
+            ladder = self.group_ladders.get(group)
+            old_df = self.groups[group]
+            old_scores = self._sorted_scores[group]
+            count = len(old_df)
+            old_rank = int(old_df['排名'].iat[old_position])
+            
+            # 更正後的本人資料列（比較排序鍵用）
+            row = old_df.iloc[[old_position]].copy()
+            self._add_score(row, 0, delta, category)
+            new_position = self._insert_position(old_df, old_scores, old_position, row)
+            
+            # 原位置與新位置之間的資料列平移一格
+            low, high = sorted((old_position, new_position))
+            row_order = np.arange(count)
+            if new_position < old_position:
+                row_order[low:high + 1] = np.concatenate(([old_position], np.arange(low, high)))
+            else:
+                row_order[low:high + 1] = np.concatenate((np.arange(low + 1, high + 1), [old_position]))
+            group_df = old_df.take(row_order).reset_index(drop=True)
+            self._add_score(group_df, new_position, delta, category)
+            totals = group_df['total'].to_numpy()
+            
+            # 排序分數陣列（由低到高，與名次順序相反；總分改為小數時一併轉型），只有平移區間的分數改變
+            scores = old_scores.astype(totals.dtype)
+            scores[count - 1 - high:count - low] = totals[low:high + 1][::-1]
+            
+            # 名次會改變的區間：同名次區塊跨過區間末端時，區塊內其餘的列名次也會改變
+            if self.tie_policy == 'ordinal':
+                end = high
+            elif self.tie_policy == 'dense':
+                end = count - 1
+            else:
+                end = max(self._tie_run_end(group_df, scores, high), self._tie_run_end(old_df, old_scores, high))
+            
+            ranks = self._window_ranks(group_df, low, end)
+            group_df.iloc[low:end + 1, group_df.columns.get_loc('排名')] = ranks
+            
+            prizes = self._prize_values(ranks, totals[low:end + 1], ladder)
+            for k, col in enumerate(('獎金', '獎牌', '顏色')):
+                group_df.iloc[low:end + 1, group_df.columns.get_loc(col)] = prizes[:, k].tolist()
+            
+            # 差距：名次區間與其後一個同名次區塊（其距前一名以區間內的分數計算）；
+            # 區間含獎級分界或獎金線名次、或 dense 規則（第 n 名分數為第 n 個不同的總分）時整組重算
+            rank_scores = None
+            cutoffs = self.get_next_tier_cutoffs(ladder)
+            if self.tie_policy == 'dense':
+                rank_scores = totals[np.concatenate(([True], totals[1:] != totals[:-1]))] if count else totals
+                gap_positions = np.arange(count)
+            elif np.any((cutoffs >= low + 1) & (cutoffs <= high + 1)):
+                gap_positions = np.arange(count)
+            else:
+                gap_end = end
+                if end + 1 < count:
+                    gap_end = end + 1 if self.tie_policy == 'ordinal' else self._tie_run_end(group_df, scores, end + 1)
+                gap_positions = np.arange(low, gap_end + 1)
+            gap_ranks = group_df['排名'].to_numpy()[gap_positions]
+            gaps = self._gap_values(totals, gap_positions, ladder, gap_ranks, rank_scores)
+            for col, values in gaps.items():
+                column = group_df.columns.get_loc(col)
+                if pd.api.types.is_integer_dtype(group_df[col]) and values.dtype.kind == 'f':
+                    group_df[col] = group_df[col].astype('float64')
+                group_df.iloc[gap_positions, column] = values
+            
+            # 只更新平移區間內的查詢索引；由後往前更新，同名時保留名次較前者（與 _build_person_index 相同）
+            names = group_df['姓名'].to_numpy()
+            for position in range(high, low - 1, -1):
+                current = self._person_index.get(names[position])
+                if current is None or (current[0] == group and (low <= current[1] <= high or position < current[1])):
+                    self._person_index[names[position]] = (group, position)
+            
+            self._replace_group(group, group_df, scores)
+            
+            return {
+                'group': group,
+                'old_rank': old_rank,
+                'new_rank': int(group_df['排名'].iat[new_position]),
+                'total': totals[new_position],
+            }
+    
+    def _insert_position(self, group_df, scores, position, row):
+        """更正後的資料列在組內的新位置
+
+        排在總分較高（同分時排序鍵較前）的其他參賽者之後；總分與排序鍵都相同時排在原本的參賽者之後。
+
+        Args:
+            group_df: 更正前的排名資料表
+            scores: 更正前由低到高排序的總分
+            position: 本人在 group_df 中的位置
+            row: 更正後的本人資料列（只含一列的 DataFrame）
+        """
+        count = len(group_df)
+        old_total = group_df['total'].iat[position]
+        new_total = row['total'].iat[0]
+        
+        # 其他參賽者中總分高於、以及大於等於新總分的人數
+        greater = count - int(np.searchsorted(scores, new_total, side='right')) - int(old_total > new_total)
+        at_least = count - int(np.searchsorted(scores, new_total, side='left')) - int(old_total >= new_total)
         
-        # 在男性組中查找
-        male_result = self.male_df[self.male_df['姓名'] == name]
-        if not male_result.empty:
-            return male_result.iloc[0], '男性組', len(self.male_df)
+        own_keys = self.tie_break_keys(row)
+        if not own_keys or at_least == greater:
+            return at_least
         
-        return None, None, None
+        # 同分區塊內依排序鍵比較（只計算同分區塊的排序鍵，略過本人原本的列）
+        tied = np.arange(greater, at_least)
+        tied[tied >= position] += 1
+        before = np.zeros(len(tied), dtype=bool)
+        equal = np.ones(len(tied), dtype=bool)
+        for key, own in zip(self.tie_break_keys(group_df.iloc[tied]), own_keys):
+            before |= equal & (key < own[0])
+            equal &= key == own[0]
+        return greater + int(np.count_nonzero(before | equal))
+    
+    def _tie_run_end(self, group_df, scores, position):
+        """從 position 開始與其同名次（總分與排序鍵相同）的連續資料列的最後一個位置
+
+        Args:
+            scores: group_df 由低到高排序的總分
+        """
+        total = group_df['total'].iat[position]
+        end = len(scores) - 1 - int(np.searchsorted(scores, total, side='left'))
+        keys = self.tie_break_keys(group_df.iloc[position:end + 1])
+        if keys:
+            same = np.logical_and.reduce([key == key[0] for key in keys])
+            end = position + (len(same) if same.all() else int(np.argmin(same))) - 1
+        return end
+    
+    def _window_ranks(self, group_df, start, end):
+        """位置 start 到 end 的名次（start 之前的資料列與名次不變）"""
+        if self.tie_policy == 'ordinal':
+            return np.arange(start + 1, end + 2)
+        
+        # 與前一列（含 start 的前一列）分數或排序鍵不同時開始新的同名次區塊
+        lead = max(start - 1, 0)
+        window = group_df.iloc[lead:end + 1]
+        window_totals = window['total'].to_numpy()
+        new_block = np.ones(len(window), dtype=bool)
+        new_block[1:] = window_totals[1:] != window_totals[:-1]
+        for key in self.tie_break_keys(window):
+            new_block[1:] |= key[1:] != key[:-1]
+        previous_rank = int(group_df['排名'].iat[lead]) if start > 0 else 0
+        
+        if self.tie_policy == 'dense':
+            ranks = previous_rank + np.cumsum(new_block) if start == 0 else previous_rank + np.cumsum(new_block[1:])
+            return ranks
+        
+        # 名次為所在同名次區塊的第一個位置 + 1
+        block_starts = np.where(new_block, np.arange(lead, end + 1), 0)
+        if start > 0:
+            block_starts[0] = previous_rank - 1
+        ranks = np.maximum.accumulate(block_starts) + 1
+        return ranks if start == 0 else ranks[1:]
+    
+    def _replace_group(self, group, group_df, scores):
+        """以新的物件替換單一組別的排名資料表與排序分數陣列（原物件不修改）"""
+        groups = dict(self.groups)
+        groups[group] = group_df
+        sorted_scores = dict(self._sorted_scores)
+        sorted_scores[group] = scores
+        
+        self.groups = groups
+        self._sorted_scores = sorted_scores
+        self.female_df = groups.get('女性組')
+        self.male_df = groups.get('男性組')
+    
+    @staticmethod
+    def _add_score(group_df, position, delta, category=None):
+        """將分數增減加到指定列的總分（與分項欄位）"""
+        for col in ('total', category):
+            if col is None:
+                continue
+            value = group_df[col].iat[position] + delta
+            if pd.api.types.is_integer_dtype(group_df[col]) and value != int(value):
+                group_df[col] = group_df[col].astype('float64')
+            group_df.iloc[position, group_df.columns.get_loc(col)] = value
+    
+    def get_person_info(self, name):
+        """查詢個人資訊"""
+        with self._update_lock:
+            location = self.locate_person(name)
+            if location is None:
+                return None, None, None
+            
+            group, position = location
+            group_df = self.groups[group]
+        return group_df.iloc[position], group, len(group_df)
     
     def get_top_n(self, n=10):
         """獲取兩組前 N 名"""
@@ -132,6 +687,9 @@ class RankingEngine:
     
     def get_rank_difference(self, person_data, group_df):
         """計算與前一名的分數差距"""
+        if '距前一名' in person_data.index:
+            return person_data['距前一名']
+        
         current_rank = person_data['排名']
         if current_rank == 1:
             return 0  # 已經是第一名
@@ -146,7 +704,7 @@ class RankingEngine:
         if '所屬部門' not in self.df.columns:
             return None
         
-        dept_stats = self.df.groupby(['所屬部門', '性別']).agg({
+        dept_stats = self.df.groupby(['所屬部門', '性別'], observed=True).agg({
             '姓名': 'count',
             'total': 'mean'
         }).reset_index()
@@ -155,17 +713,18 @@ class RankingEngine:
         return dept_stats
     
     def get_prize_winners(self):
-        """獲取所有得獎者（男子組前14名，女子組前28名）"""
-        female_winners = self.female_df.head(28) if self.female_df is not None else pd.DataFrame()
-        male_winners = self.male_df.head(14) if self.male_df is not None else pd.DataFrame()
+        """獲取所有得獎者（各組獎金結構內的名次）"""
+        female_winners = self.female_df.head(self.max_prize_rank('女性組')) if self.female_df is not None else pd.DataFrame()
+        male_winners = self.male_df.head(self.max_prize_rank('男性組')) if self.male_df is not None else pd.DataFrame()
         
         return female_winners, male_winners
     
-    @staticmethod
-    def style_ranking_table(df, gender='male'):
+    @classmethod
+    def style_ranking_table(cls, df, ladder='male'):
         """表格樣式化（高亮獎金得主）"""
+        max_prize_rank = len(cls.get_prize_table(ladder)) - 1
+        
         def highlight_winners(row):
-            max_prize_rank = 28 if gender == 'female' else 14
             if row['排名'] <= max_prize_rank:
                 return ['background-color: #fff9e6; font-weight: bold'] * len(row)
             return [''] * len(row)
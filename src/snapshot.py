@@ -0,0 +1,449 @@
+"""
+資料快照
+將同一資料版本的處理結果（帳號、期間資料、社團明細、參加者統計）集中為單一不可變物件，
+由資料載入器、活動分析器與排名計算共用，避免重複解析與重複保存相同的資料表
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from types import MappingProxyType
+
+from frame_schema import apply_schema, memory_report
+from new_activity_analyzer import overall_statistics
+from new_data_processor import NewDataProcessor, file_sha256, release_workbook
+from pipeline_timing import logger, timed_stage
+
+
+# 修改時間距今在此秒數內時視為不可靠（檔案可能在同一個時間刻度內再次被寫入），需以內容雜湊確認
+MTIME_AMBIGUITY_SECONDS = 2.0
+
+# 檔案路徑 → (修改時間, 大小, 內容雜湊)
+_content_hashes = {}
+
+# 快照檔格式版本（快照內容或欄位型別變更時遞增，舊檔會被視為過期）
+SNAPSHOT_FORMAT_VERSION = 3
+
+# 預先建立的快照目錄名稱（與工作簿放在同一目錄；各資料表存成 Parquet，其餘內容存於清單）
+SNAPSHOT_DIRNAME = 'dashboard_snapshot'
+SNAPSHOT_MANIFEST = 'manifest.json'
+
+# 快照中以 Parquet 保存的資料表（期間資料另以 period_data/<工作表名稱> 保存）
+SNAPSHOT_FRAMES = ('account_info', 'club_details', 'participant_stats', 'dashboard_table', 'memory_report')
+
+# 活動統計分析報告檔名（與工作簿放在同一目錄）
+REPORT_FILENAME = '活動統計分析報告.xlsx'
+
+# 工作簿大於此位元組數時以串流模式建立快照（逐批讀取，不一次載入所有工作表）
+STREAMING_MIN_BYTES = 50 * 1024 * 1024
+
+
+def data_version(excel_path):
+    """取得資料版本（檔案路徑與內容雜湊）
+
+    內容雜湊依修改時間與大小記憶，只有在檔案的修改時間或大小改變、
+    或修改時間距今太近而無法判斷時才重新計算；因此只有資料內容真正變更時版本才會不同。
+    """
+    stat = os.stat(excel_path)
+    ambiguous = time.time() - stat.st_mtime < MTIME_AMBIGUITY_SECONDS
+
+    cached = _content_hashes.get(excel_path)
+    if cached is None or cached[:2] != (stat.st_mtime_ns, stat.st_size) or ambiguous:
+        cached = (stat.st_mtime_ns, stat.st_size, file_sha256(excel_path))
+        _content_hashes[excel_path] = cached
+
+    return (excel_path, cached[2])
+
+
+class Snapshot:
+    """資料快照（建立後不可修改）"""
+
+    __slots__ = (
+        'version',
+        'built_at',
+        'account_info',
+        'period_data',
+        'club_details',
+        'participant_stats',
+        'dashboard_table',
+        'memory_report',
+        'overall_statistics',
+        'report_summary',
+    )
+
+    def __init__(self, version, account_info, period_data, club_details, participant_stats, dashboard_table,
+                 memory_report=None, overall_statistics=None, report_summary=None):
+        """
+        Args:
+            version: 資料版本
+            account_info: 帳號整理資料（以帳號為索引）
+            period_data: 各期間工作表資料 {工作表名稱: DataFrame}
+            club_details: 社團活動明細表（Long格式）
+            participant_stats: 參加者活動統計表（每人每期間一筆）
+            dashboard_table: 儀表板格式的參加者活動統計表（每人一筆）
+            memory_report: 套用精簡欄位型別前後的記憶體用量
+            overall_statistics: 整體活動統計（各活動總次數與參與人數）
+            report_summary: 活動統計分析報告摘要（見 read_report_summary），沒有報告時為 None
+        """
+        values = {
+            'version': version,
+            'built_at': datetime.now(),
+            'account_info': account_info,
+            'period_data': MappingProxyType(dict(period_data)),
+            'club_details': club_details,
+            'participant_stats': participant_stats,
+            'dashboard_table': dashboard_table,
+            'memory_report': memory_report,
+            'overall_statistics': overall_statistics,
+            'report_summary': report_summary,
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Snapshot 建立後不可修改")
+
+    def __delattr__(self, name):
+        raise AttributeError("Snapshot 建立後不可修改")
+
+    def __repr__(self):
+        return f"Snapshot(version={self.version!r}, participants={len(self.dashboard_table)})"
+
+    def to_payload(self):
+        """轉為可序列化的內容（不含資料版本中的本機路徑）"""
+        return {
+            'built_at': self.built_at,
+            'account_info': self.account_info,
+            'period_data': dict(self.period_data),
+            'club_details': self.club_details,
+            'participant_stats': self.participant_stats,
+            'dashboard_table': self.dashboard_table,
+            'memory_report': self.memory_report,
+            'overall_statistics': self.overall_statistics,
+            'report_summary': self.report_summary,
+        }
+
+    @classmethod
+    def from_payload(cls, version, payload):
+        """由序列化內容還原快照"""
+        snapshot = cls(
+            version=version,
+            account_info=payload['account_info'],
+            period_data=payload['period_data'],
+            club_details=payload['club_details'],
+            participant_stats=payload['participant_stats'],
+            dashboard_table=payload['dashboard_table'],
+            memory_report=payload['memory_report'],
+            overall_statistics=payload['overall_statistics'],
+            report_summary=payload['report_summary'],
+        )
+        object.__setattr__(snapshot, 'built_at', payload['built_at'])
+        return snapshot
+
+
+def report_fingerprint(report_path):
+    """報告檔的版本（檔名、內容雜湊），檔案不存在時回傳 None
+
+    不含目錄與修改時間，快照在其他機器或重新 checkout 後仍可比對。
+    """
+    if not os.path.exists(report_path):
+        return None
+    return (os.path.basename(report_path), data_version(report_path)[1])
+
+
+def read_report_summary(report_path):
+    """讀取活動統計分析報告的參賽者總數與名單
+
+    Returns:
+        dict: filename、sha256（見 report_fingerprint）、participant_count（可能為 None）與 names（frozenset）；
+            報告不存在時回傳 None
+    """
+    import pandas as pd
+
+    fingerprint = report_fingerprint(report_path)
+    if fingerprint is None:
+        return None
+
+    report = pd.read_excel(report_path, sheet_name=['統計摘要', '個人總計統計'])
+    report_summary = report['統計摘要']
+    report_individual = report['個人總計統計']
+
+    participant_count = None
+    matched = report_summary.loc[report_summary['統計項目'] == '參賽者總數', '數值']
+    if not matched.empty:
+        participant_count = int(matched.iloc[0])
+
+    return {
+        'filename': fingerprint[0],
+        'sha256': fingerprint[1],
+        'participant_count': participant_count,
+        'names': frozenset(report_individual['姓名'].tolist()),
+    }
+
+
+@timed_stage('建立資料快照')
+def build_snapshot(excel_path, version=None, streaming=None):
+    """解析工作簿並建立資料快照
+
+    Args:
+        streaming: 是否以串流模式處理期間工作表；None 時依工作簿大小（STREAMING_MIN_BYTES）自動選擇。
+            串流模式不保留完整的期間工作表，快照的 period_data 為空。
+    """
+    if version is None:
+        version = data_version(excel_path)
+    if streaming is None:
+        streaming = os.path.getsize(excel_path) >= STREAMING_MIN_BYTES
+
+    processor = NewDataProcessor(excel_path, streaming=streaming)
+    try:
+        processor.load_account_info()
+        if streaming:
+            processor.stream_period_sheets()
+        else:
+            processor.load_all_periods()
+            processor.process_period_sheets()
+        participant_stats = processor.build_participant_activity_stats()
+    finally:
+        # 快照只保存精簡後的資料表，原始工作表不再保留於模組層級的工作簿快取
+        release_workbook(processor.excel_path)
+    if participant_stats is None:
+        return None
+
+    # 套用精簡欄位型別（類別、int32、Arrow 字串），多個工作階段共用時降低記憶體用量
+    frames = {
+        'account_info': processor.account_info,
+        'club_details': processor.club_details,
+        'participant_stats': participant_stats,
+        'dashboard_table': processor.build_dashboard_table(),
+    }
+    frames.update({f"period_data[{name}]": df for name, df in processor.period_data.items()})
+    compact = {name: apply_schema(df) for name, df in frames.items()}
+    report = memory_report(frames, compact)
+
+    # 預先計算整體統計與報告摘要，儀表板每次重新執行時不需重新計算或讀取報告
+    try:
+        report_summary = read_report_summary(os.path.join(os.path.dirname(excel_path), REPORT_FILENAME))
+    except Exception as e:
+        logger.warning("讀取活動統計分析報告失敗：%s", e)
+        report_summary = None
+
+    snapshot = Snapshot(
+        version=version,
+        account_info=compact['account_info'],
+        period_data={name: compact[f"period_data[{name}]"] for name in processor.period_data},
+        club_details=compact['club_details'],
+        participant_stats=compact['participant_stats'],
+        dashboard_table=compact['dashboard_table'],
+        memory_report=report,
+        overall_statistics=overall_statistics(compact['participant_stats']),
+        report_summary=report_summary,
+    )
+    total = report.iloc[-1]
+    logger.info("資料快照建立完成：%d 位參賽者，記憶體 %.1f KB → %.1f KB",
+                len(snapshot.dashboard_table), total['原始大小'] / 1024, total['精簡後大小'] / 1024)
+    return snapshot
+
+
+def snapshot_artifact_path(excel_path):
+    """取得工作簿對應的預先建立快照目錄路徑"""
+    return os.path.join(os.path.dirname(os.path.abspath(excel_path)), SNAPSHOT_DIRNAME)
+
+
+def save_snapshot(snapshot, output_path=None):
+    """將快照寫入快照目錄（先寫入暫存目錄再替換，讀取端不會讀到寫到一半的內容）
+
+    資料表存成 Parquet，其餘內容與格式版本、來源工作簿的內容雜湊存於 JSON 清單，
+    不依賴 pandas 的 pickle 格式，重新部署安裝不同版本的 pandas 後仍可載入。
+    """
+    if output_path is None:
+        output_path = snapshot_artifact_path(snapshot.version[0])
+
+    payload = snapshot.to_payload()
+    frames = {name: payload[name] for name in SNAPSHOT_FRAMES if payload[name] is not None}
+    frames.update({f"period_data/{name}": df for name, df in payload['period_data'].items()})
+
+    report_summary = payload['report_summary']
+    if report_summary is not None:
+        report_summary = dict(report_summary, names=sorted(report_summary['names']))
+
+    tmp_dir = f"{output_path}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    frame_files = []
+    for i, (name, df) in enumerate(frames.items()):
+        file_name = f"{i:02d}.parquet"
+        df.to_parquet(os.path.join(tmp_dir, file_name))
+        frame_files.append([name, file_name])
+
+    manifest = {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'source_sha256': snapshot.version[1],
+        'built_at': payload['built_at'].isoformat(),
+        'frames': frame_files,
+        'overall_statistics': payload['overall_statistics'],
+        'report_summary': report_summary,
+    }
+    with open(os.path.join(tmp_dir, SNAPSHOT_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    shutil.rmtree(output_path, ignore_errors=True)
+    os.replace(tmp_dir, output_path)
+    return output_path
+
+
+@timed_stage('載入快照檔')
+def load_snapshot(excel_path, version=None, artifact_path=None):
+    """載入預先建立的快照目錄
+
+    快照目錄不存在、格式版本不同、或來源工作簿內容已變更時回傳 None。
+    """
+    import pandas as pd
+
+    if artifact_path is None:
+        artifact_path = snapshot_artifact_path(excel_path)
+    manifest_path = os.path.join(artifact_path, SNAPSHOT_MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    if version is None:
+        version = data_version(excel_path)
+
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("讀取快照檔失敗：%s", e)
+        return None
+    if not isinstance(manifest, dict):
+        return None
+
+    if manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+        logger.info("快照檔格式版本不同，改為重新建立")
+        return None
+    if manifest.get('source_sha256') != version[1]:
+        logger.info("快照檔已過期（工作簿內容已變更），改為重新建立")
+        return None
+
+    try:
+        frames = {
+            name: pd.read_parquet(os.path.join(artifact_path, file_name))
+            for name, file_name in manifest['frames']
+        }
+        report_summary = manifest['report_summary']
+        if report_summary is not None:
+            report_summary = dict(report_summary, names=frozenset(report_summary['names']))
+        payload = {
+            'built_at': datetime.fromisoformat(manifest['built_at']),
+            'period_data': {
+                name[len('period_data/'):]: df for name, df in frames.items() if name.startswith('period_data/')
+            },
+            'overall_statistics': manifest['overall_statistics'],
+            'report_summary': report_summary,
+        }
+        payload.update({name: frames.get(name) for name in SNAPSHOT_FRAMES})
+    except Exception as e:
+        # 清單不完整或資料表檔案損毀時視為沒有快照檔
+        logger.warning("讀取快照檔失敗：%s", e)
+        return None
+
+    snapshot = Snapshot.from_payload(version, payload)
+    logger.info("載入預先建立的快照檔：%d 位參賽者", len(snapshot.dashboard_table))
+    return snapshot
+
+
+def load_or_build_snapshot(excel_path, version=None):
+    """優先載入預先建立且仍有效的快照檔，否則解析工作簿建立快照"""
+    if version is None:
+        version = data_version(excel_path)
+    snapshot = load_snapshot(excel_path, version)
+    if snapshot is None:
+        snapshot = build_snapshot(excel_path, version)
+    return snapshot
+
+
+class SnapshotRefresher:
+    """背景更新資料快照
+
+    背景執行緒定期（或被請求喚醒時）檢查資料版本，版本變更時在背景建立下一份快照，
+    完成後以單一參考指派原子替換；替換前所有請求繼續使用前一份快照。
+    """
+
+    def __init__(self, excel_path, interval=30):
+        """
+        Args:
+            excel_path: 每周分數累積工作簿路徑
+            interval: 背景檢查資料版本的間隔秒數
+        """
+        self.excel_path = excel_path
+        self.interval = interval
+        self.last_error = None
+
+        self._snapshot = None
+        self._build_lock = threading.Lock()  # 同時只建立一份快照
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def current(self):
+        """目前使用中的快照（可能為 None）"""
+        return self._snapshot
+
+    def get(self):
+        """取得目前快照，並通知背景執行緒檢查是否有新版本
+
+        尚無任何快照時（程序第一次載入）才會同步建立。
+        """
+        if self._snapshot is None:
+            with self._build_lock:
+                if self._snapshot is None:
+                    self._snapshot = load_or_build_snapshot(self.excel_path)
+
+        self._ensure_thread()
+        self._wake.set()
+        return self._snapshot
+
+    def refresh(self):
+        """檢查資料版本，有變更時建立新快照並替換
+
+        Returns:
+            bool: 是否替換了快照
+        """
+        version = data_version(self.excel_path)
+        current = self._snapshot
+        if current is not None and current.version == version:
+            return False
+
+        with self._build_lock:
+            current = self._snapshot
+            if current is not None and current.version == version:
+                return False
+
+            snapshot = load_or_build_snapshot(self.excel_path, version)
+            if snapshot is None:
+                return False
+
+            # 單一參考指派：讀取端只會看到舊快照或完整的新快照
+            self._snapshot = snapshot
+
+        logger.info("資料快照已更新：%r", snapshot)
+        return True
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='snapshot-refresher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                # 建立失敗時保留目前快照，下次檢查再重試
+                self.last_error = e
+                logger.warning("背景更新資料快照失敗：%s", e)
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試排名計算引擎（以逐一比較的暴力解驗證名次、獎金與分數差距）
+"""
+
+import sys
+sys.path.append('src')
+
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ranking_engine import RankingEngine
+
+
+GROUPS = {'女性組': ('女', 'female'), '男性組': ('男', 'male')}
+PERIOD_COLUMNS = ['total_期間1', 'total_期間2']
+CATEGORY_COLUMNS = ['日常運動總分', '飲食總分', '社團活動總分', 'Bonus總分']
+
+
+def make_frame(rng, count):
+    """建立總分大量重複（含未達獎金門檻）的測試資料"""
+    rows = []
+    for i in range(count):
+        periods = [rng.choice([0, 100, 150, 200]) for _ in PERIOD_COLUMNS]
+        row = {
+            '姓名': f"參賽者{i:03d}",
+            '性別': rng.choice('女男'),
+            'total': sum(periods),
+        }
+        row.update(dict(zip(PERIOD_COLUMNS, periods)))
+        row.update({col: rng.choice([0, 10, 20]) for col in CATEGORY_COLUMNS})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def tie_break_key(row, tie_policy):
+    """暴力解的排序鍵（越小越前面）"""
+    key = (-row['total'],)
+    if tie_policy == 'earliest':
+        cumulative = np.cumsum([row[col] for col in PERIOD_COLUMNS])
+        reached = [i for i, value in enumerate(cumulative) if value >= row['total']]
+        key += (reached[0] if reached else len(PERIOD_COLUMNS),)
+    elif tie_policy == 'category':
+        key += tuple(-row[col] for col in RankingEngine.prize_config()['tie_break_columns'])
+    return key
+
+
+def expected_rank(row, members, tie_policy):
+    """暴力解的名次：與組內每位參賽者逐一比較"""
+    own = tie_break_key(row, tie_policy)
+    better = [tie_break_key(other, tie_policy) for other in members if tie_break_key(other, tie_policy) < own]
+    if tie_policy == 'dense':
+        return len(set(better)) + 1
+    return len(better) + 1
+
+
+def expected_prize_and_gaps(rank, total, rank_scores, ladder):
+    """暴力解的 (獎金, 獎牌, 顏色) 與分數差距"""
+    tiers = RankingEngine.prize_config()['ladders'][ladder]
+    max_prize_rank = tiers[-1]['ranks'][1]
+
+    prize = RankingEngine.NO_PRIZE
+    if total >= RankingEngine.PRIZE_MIN_SCORE:
+        for tier in tiers:
+            if tier['ranks'][0] <= rank <= tier['ranks'][1]:
+                prize = (tier['prize'], tier['medal'], tier['color'])
+
+    def gap_to(target_rank):
+        if target_rank <= 0:
+            return 0
+        return max(rank_scores[min(target_rank, len(rank_scores)) - 1] - total, 0)
+
+    if rank > max_prize_rank:
+        next_tier = max_prize_rank
+    else:
+        tier_index = next(i for i, tier in enumerate(tiers) if tier['ranks'][0] <= rank <= tier['ranks'][1])
+        next_tier = tiers[tier_index - 1]['ranks'][1] if tier_index > 0 else 0
+
+    gaps = {
+        '距前一名': gap_to(rank - 1),
+        '距下一獎級': gap_to(next_tier),
+        '距獎金線': gap_to(max_prize_rank) if rank > max_prize_rank else 0,
+        '距獎金門檻': max(RankingEngine.PRIZE_MIN_SCORE - total, 0),
+    }
+    return prize, gaps
+
+
+def assert_rankings(engine, df):
+    """檢查引擎的各組排名資料表與依 df 逐一比較的結果相同"""
+    for group, (gender, ladder) in GROUPS.items():
+        group_df = engine.groups[group]
+        members = df[df['性別'] == gender].to_dict('records')
+        assert sorted(group_df['姓名']) == sorted(row['姓名'] for row in members)
+
+        totals = group_df['total'].to_numpy()
+        assert (np.diff(totals) <= 0).all()
+        np.testing.assert_array_equal(engine._sorted_scores[group], totals[::-1])
+
+        by_name = {row['姓名']: row for row in members}
+        ranks = group_df['排名'].to_numpy()
+        if engine.tie_policy == 'ordinal':
+            np.testing.assert_array_equal(ranks, np.arange(1, len(group_df) + 1))
+        else:
+            assert list(ranks) == [expected_rank(by_name[name], members, engine.tie_policy)
+                                   for name in group_df['姓名']]
+
+        # dense 規則的第 n 名分數為第 n 個不同的總分，其他規則為第 n 位的總分
+        rank_scores = sorted(set(totals), reverse=True) if engine.tie_policy == 'dense' else list(totals)
+        for position, row in enumerate(group_df.to_dict('records')):
+            assert row['total'] == by_name[row['姓名']]['total']
+            prize, gaps = expected_prize_and_gaps(row['排名'], row['total'], rank_scores, ladder)
+            assert (row['獎金'], row['獎牌'], row['顏色']) == prize
+            for col, value in gaps.items():
+                assert row[col] == value, (row['姓名'], col)
+            assert engine.locate_person(row['姓名']) == (group, position)
+
+
+def ranked_engine(df, tie_policy):
+    engine = RankingEngine(df.copy(), tie_policy=tie_policy)
+    engine.calculate_rankings()
+    return engine
+
+
+@pytest.mark.parametrize('tie_policy', RankingEngine.TIE_POLICIES)
+def test_apply_score_update_matches_brute_force(tie_policy):
+    """單筆分數更正後的名次、獎金與差距與逐一比較的結果相同"""
+    rng = random.Random(23)
+    for count in (6, 45, 70):
+        df = make_frame(rng, count)
+        engine = ranked_engine(df, tie_policy)
+        for _ in range(25):
+            name = rng.choice(df['姓名'].tolist())
+            delta = rng.choice([-300, -100, -50, 0, 50, 100, 150, 300])
+            category = rng.choice([None, '日常運動總分'])
+
+            result = engine.apply_score_update(name, delta, category)
+
+            row = df.index[df['姓名'] == name][0]
+            for col in ('total', category):
+                if col is not None:
+                    df.loc[row, col] += delta
+            assert result['total'] == df.loc[row, 'total']
+            assert_rankings(engine, df)
+            group, position = engine.locate_person(name)
+            assert result['new_rank'] == engine.groups[group]['排名'].iat[position]
+
+
+@pytest.mark.parametrize('tie_policy', ['min', 'dense', 'earliest', 'category'])
+def test_apply_score_update_matches_full_rerank(tie_policy):
+    """ordinal 以外的規則中，更正後每位參賽者的排名欄位與重新計算整組的結果相同"""
+    rng = random.Random(7)
+    df = make_frame(rng, 60)
+    engine = ranked_engine(df, tie_policy)
+    for _ in range(20):
+        name = rng.choice(df['姓名'].tolist())
+        delta = rng.choice([-150, -50, 50, 150])
+        engine.apply_score_update(name, delta)
+        df.loc[df['姓名'] == name, 'total'] += delta
+
+    rerank = ranked_engine(df, tie_policy)
+    for group in GROUPS:
+        pd.testing.assert_frame_equal(
+            engine.groups[group].set_index('姓名').sort_index(),
+            rerank.groups[group].set_index('姓名').sort_index(),
+            check_dtype=False,
+        )
+
+
+def test_apply_score_update_keeps_previous_frames():
+    """更正產生新的排名資料表，已取得的資料表不會被修改"""
+    df = make_frame(random.Random(3), 40)
+    engine = ranked_engine(df, 'ordinal')
+    female_df = engine.female_df
+    before = female_df.copy()
+
+    name = female_df['姓名'].iat[-1]
+    engine.apply_score_update(name, 1000)
+
+    pd.testing.assert_frame_equal(female_df, before)
+    assert engine.female_df is not female_df
+    assert engine.female_df['姓名'].iat[0] == name
+
+
+def test_apply_score_update_fractional_delta():
+    """小數分數更正後總分欄位改為小數，名次照常計算"""
+    df = make_frame(random.Random(5), 30)
+    engine = ranked_engine(df, 'ordinal')
+    name = engine.male_df['姓名'].iat[3]
+
+    result = engine.apply_score_update(name, 0.5)
+
+    df['total'] = df['total'].astype('float64')
+    df.loc[df['姓名'] == name, 'total'] += 0.5
+    assert result['total'] == df.loc[df['姓名'] == name, 'total'].iat[0]
+    assert engine.male_df['total'].dtype.kind == 'f'
+    assert_rankings(engine, df)
+
+
+def test_apply_score_update_unknown_name():
+    """找不到參賽者時回傳 None"""
+    engine = ranked_engine(make_frame(random.Random(1), 10), 'ordinal')
+    assert engine.apply_score_update('不存在的人', 100) is None
+
+
+@pytest.mark.parametrize('tie_policy', RankingEngine.TIE_POLICIES)
+def test_tie_policy_matches_brute_force(tie_policy):
+    """各同分名次規則的名次、獎金與分數差距與逐一比較的結果相同"""
+    rng = random.Random(25)
+    for count in (1, 8, 45, 90):
+        df = make_frame(rng, count)
+        assert_rankings(ranked_engine(df, tie_policy), df)
+
+
+def test_tie_policies_on_equal_totals():
+    """同分時 min 規則跳號、dense 規則不跳號、ordinal 規則依序給不同名次"""
+    df = pd.DataFrame({
+        '姓名': list('ABCDEF'),
+        '性別': '女',
+        'total': [300, 250, 300, 250, 250, 100],
+    })
+    expected = {
+        'ordinal': [1, 2, 3, 4, 5, 6],
+        'min': [1, 1, 3, 3, 3, 6],
+        'dense': [1, 1, 2, 2, 2, 3],
+    }
+    for tie_policy, ranks in expected.items():
+        engine = ranked_engine(df, tie_policy)
+        assert engine.female_df['排名'].tolist() == ranks
+        assert engine.female_df['total'].tolist() == [300, 300, 250, 250, 250, 100]
+
+
+def test_earliest_and_category_break_ties():
+    """earliest 規則較早達到總分者在前，category 規則依分項得分由高到低比較"""
+    df = pd.DataFrame({
+        '姓名': ['晚達到', '早達到', '同期間'],
+        '性別': '男',
+        'total': [300, 300, 300],
+        'total_期間1': [100, 300, 300],
+        'total_期間2': [200, 0, 0],
+        '日常運動總分': [30, 10, 10],
+        '飲食總分': [0, 0, 20],
+        '社團活動總分': [0, 0, 0],
+        'Bonus總分': [0, 0, 0],
+    })
+    earliest = ranked_engine(df, 'earliest').male_df
+    assert dict(zip(earliest['姓名'], earliest['排名'])) == {'早達到': 1, '同期間': 1, '晚達到': 3}
+
+    category = ranked_engine(df, 'category').male_df
+    assert category['姓名'].tolist() == ['晚達到', '同期間', '早達到']
+    assert category['排名'].tolist() == [1, 2, 3]
+
+
+def test_tie_policy_alias_and_unknown_policy():
+    """competition 為 min 的別名，未知的規則會引發 ValueError"""
+    assert RankingEngine.resolve_tie_policy('competition') == 'min'
+    with pytest.raises(ValueError):
+        RankingEngine.resolve_tie_policy('random')
+
+
+@pytest.mark.parametrize('tie_policy', RankingEngine.TIE_POLICIES)
+def test_simulate_score_matches_rerank(tie_policy):
+    """試算名次與獎金和將分數加入後逐一比較的結果相同
+
+    min、dense 規則同分同名次；其他規則中試算的分數最晚達到，排在已達到該分數的參賽者之後。
+    """
+    rng = random.Random(22)
+    df = make_frame(rng, 70)
+    engine = ranked_engine(df, tie_policy)
+    for name in rng.sample(df['姓名'].tolist(), 25):
+        extra_points = rng.choice([0, 50, 100, 150, 400])
+        result = engine.simulate_score(name, extra_points)
+
+        updated = df.copy()
+        updated.loc[updated['姓名'] == name, 'total'] += extra_points
+        row = updated[updated['姓名'] == name].iloc[0]
+        gender, ladder = GROUPS[result['group']]
+        members = updated[updated['性別'] == gender].to_dict('records')
+        if tie_policy in ('min', 'dense'):
+            rank = expected_rank(row, members, tie_policy)
+        else:
+            rank = 1 + sum(other['total'] >= row['total'] for other in members if other['姓名'] != name)
+
+        current_rank = engine.groups[result['group']]['排名'].iat[engine.locate_person(name)[1]]
+        prize, _ = expected_prize_and_gaps(result['rank'], row['total'], [row['total']], ladder)
+        assert result['total'] == row['total']
+        assert result['rank'] == (current_rank if extra_points == 0 else rank)
+        assert result['rank_change'] == current_rank - result['rank']
+        assert (result['prize'], result['medal'], result['color']) == prize
+
+
+def test_simulate_score_unknown_name():
+    """找不到參賽者時回傳 None"""
+    engine = ranked_engine(make_frame(random.Random(1), 10), 'ordinal')
+    assert engine.simulate_score('不存在的人', 100) is None